@@ -0,0 +1,99 @@
+""" Per-channel alarms of the relay.
+
+    The monitor checks the whole vector of channel values at once:
+        low   - value is less than min
+        high  - value is greater than max
+        rate  - change of value per frame is greater than rate
+        stuck - value is not changed (within hysteresis) for stuck frames
+
+    The alarm is cleared only when the value returns inside the limit
+    by more than hysteresis, so the noisy value does not flap the alarm.
+    Limits are scalars (for all channels) or lists (per channel);
+    None disables the check (0 also disables rate and stuck checks).
+"""
+
+KINDS = ("low", "high", "rate", "stuck")
+
+
+def expand(limit, n):
+    """ Return list of per channel limits """
+    if isinstance(limit, (list, tuple)):
+        return list(limit[:n]) + [None] * (n - len(limit))
+    return [limit] * n
+
+
+class AlarmMonitor:
+    """ This class detects alarms of channels and returns its changes as events
+    (name, channel, kind, raised, value), channels are numbered from 1.
+    """
+
+    def __init__(self, name, min=None, max=None, rate=None, stuck=None, hysteresis=0):
+        self.name = name
+        self.limits = {"low": min, "high": max, "rate": rate}
+        self.stuck = stuck
+        self.hysteresis = hysteresis
+
+        self.size = None
+        self.previous = None
+        self.flags = {}
+        self.same = []
+        self._limits = {}
+
+    def _reset(self, n):
+        self.size = n
+        self.previous = None
+        self.flags = {kind: [False] * n for kind in KINDS}
+        self.same = [0] * n
+        self._limits = {kind: expand(limit, n) for kind, limit in self.limits.items() if limit is not None}
+
+    def update(self, values):
+        """ Check values and return list of alarm events """
+        if self.size != len(values):
+            self._reset(len(values))
+
+        h = self.hysteresis
+        previous = self.previous
+        checks = []
+
+        limits = self._limits.get('high')
+        if limits:
+            checks.append(('high', [m is not None and (v > m or (f and v > m - h))
+                                    for v, m, f in zip(values, limits, self.flags['high'])]))
+
+        limits = self._limits.get('low')
+        if limits:
+            checks.append(('low', [m is not None and (v < m or (f and v < m + h))
+                                   for v, m, f in zip(values, limits, self.flags['low'])]))
+
+        limits = self._limits.get('rate')
+        if limits and previous is not None:
+            checks.append(('rate', [bool(r) and (abs(v - p) > r or (f and abs(v - p) > r - h))
+                                    for v, p, r, f in zip(values, previous, limits, self.flags['rate'])]))
+
+        if self.stuck and previous is not None:
+            self.same = [s + 1 if abs(v - p) <= h else 0 for v, p, s in zip(values, previous, self.same)]
+            checks.append(('stuck', [s >= self.stuck for s in self.same]))
+
+        events = []
+        for kind, flags in checks:
+            old = self.flags[kind]
+            if flags != old:
+                events.extend((self.name, i + 1, kind, new, values[i])
+                              for i, new in enumerate(flags) if new != old[i])
+                self.flags[kind] = flags
+
+        self.previous = values
+        return events
+
+    def alarms(self):
+        """ Return channels (from 1) with any active alarm """
+        if not self.size:
+            return []
+        return [i + 1 for i, active in enumerate(map(any, zip(*self.flags.values()))) if active]
+
+
+def from_settings(name, settings):
+    """ Create monitor from settings {"hysteresis": h, name: {"min": .., "max": .., ...}} """
+    if not settings or not settings.get(name):
+        return None
+    return AlarmMonitor(name, hysteresis=settings.get('hysteresis', 0), **settings[name])
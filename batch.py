@@ -0,0 +1,145 @@
+""" Batch "what-if" evaluation of patterns and settings over recorded sessions.
+
+    Every configuration runs the handler chain (see handlers) with the
+    output stage over all records of the capture (see recorder), and
+    the per channel statistics of outputs is collected. Configurations
+    are processed in parallel by the pool of processes; every worker maps
+    the capture to memory read-only, so the capture is not copied.
+
+    Configurations are the JSON list:
+    [
+        {"name": "max-1-10", "pattern": "Max", "channels": "1-10"},
+        {"name": "gain", "pattern": ["L", "L", "Null"], "imax": 55,
+         "handlers": [{"name": "voltage"}, {"name": "pattern"}],
+         "slew_rate": 1.5, "alarms": {"output": {"max": 900}}}
+    ]
+
+    pattern   - state of selected channels or list of states (see sequencer)
+    channels  - numbers of channels (from 1) for the state, e.g. "1-10,15"
+                (the number of channels is taken from the capture)
+    imax      - max current, A (10 by default)
+    handlers  - chain of handlers as in sysconf.json
+    slew_rate - max change of current per frame, A (0 - without limit)
+    alarms    - alarms of outputs as in sysconf.json, raised alarms are counted
+
+    Usage: python batch.py CAPTURE CONFIGS.json SUMMARY.csv [--processes N]
+                           [--start TIME] [--stop TIME] [--every N]
+"""
+
+import argparse
+from itertools import islice
+import json
+import multiprocessing
+import sys
+
+import alarms
+from export import parse_time
+import handlers
+import proxy
+from recorder import Capture
+from runstats import RunningStats, write_csv
+from sequencer import compile_step
+
+# Capture of the worker process (see _init)
+_capture = None
+_records = None
+_every = 1
+
+
+def _init(path, first, last, every):
+    global _capture, _records, _every
+
+    _capture = Capture(path)
+    _records = _capture.map(first, last)
+    _every = every
+
+
+def _release():
+    global _capture, _records
+
+    if _records is not None:
+        _records.release()
+        _capture.close()
+    _capture = _records = None
+
+
+def evaluate(config):
+    """ Run the configuration over records of the worker and return the summary """
+    channels = _capture.outputs
+    settings = {"imax": config.get('imax', 10), "channels": channels}
+
+    step = {"pattern": config.get('pattern', 'L'), "channels": config.get('channels'), "frames": 1}
+    _, pattern, _ = compile_step(step, channels, settings['imax'], interval=1)
+    chain = handlers.build_chain(config.get('handlers'), settings)
+    chain.set_pattern(pattern)
+    stage = proxy.OutputStage(slew=int(config.get('slew_rate', 0) * 100))
+    monitor = alarms.from_settings('output', config.get('alarms'))
+
+    stats = RunningStats()
+    raised = 0
+    n = _capture.inputs
+    for record in islice(_capture.record.iter_unpack(_records), 0, None, _every):
+        outputs = stage.limit(chain(record[2:2 + n]))
+        stats.update(outputs)
+        if monitor:
+            raised += sum(1 for event in monitor.update(outputs) if event[3])
+
+    result = stats.result()
+    result["alarms"] = raised
+    return config.get('name', ''), result
+
+
+def run_batch(path, configs, processes=None, start=None, stop=None, every=1):
+    """ Evaluate configurations over the capture between start and stop times
+    (seconds since the epoch), every N-th record only.
+    Returns {name: summary} in order of configurations.
+    processes=1 evaluates in the current process.
+    """
+    if every < 1:
+        raise ValueError("every must be at least 1")
+    names = [config.get('name', '') for config in configs]
+    if len(set(names)) != len(names):
+        raise ValueError("Names of configurations must be unique")
+
+    with Capture(path) as capture:
+        first, last = capture.select(start, stop)
+    initargs = (path, first, last, every)
+
+    if processes == 1:
+        _init(*initargs)
+        try:
+            results = dict(evaluate(config) for config in configs)
+        finally:
+            _release()
+    else:
+        with multiprocessing.Pool(processes, initializer=_init, initargs=initargs) as pool:
+            results = dict(pool.imap_unordered(evaluate, configs))
+    return {name: results[name] for name in names}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate configurations over the relay capture")
+    parser.add_argument('capture')
+    parser.add_argument('configs', help="JSON list of configurations")
+    parser.add_argument('summary', help="CSV file of per channel statistics of outputs")
+    parser.add_argument('--processes', type=int, help="number of processes (all CPUs by default)")
+    parser.add_argument('--start', help="ISO time or seconds since the epoch")
+    parser.add_argument('--stop', help="ISO time or seconds since the epoch")
+    parser.add_argument('--every', type=int, default=1, help="use every N-th record")
+    args = parser.parse_args(argv)
+
+    with open(args.configs, encoding='utf-8') as f:
+        configs = json.load(f)
+
+    results = run_batch(args.capture, configs, args.processes, parse_time(args.start),
+                        parse_time(args.stop), args.every)
+    write_csv(args.summary, results)
+    for name, result in results.items():
+        peak = max((max(abs(lo), abs(hi)) for lo, hi in zip(result['min'], result['max'])), default=0)
+        print("{}: {} frames, peak {}, alarms {}".format(name, result['count'], peak, result['alarms']))
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,91 @@
+""" Startup-time benchmark of proxyui.
+
+    Starts the application several times and measures the time until
+    the main window is shown (reported by the application itself)
+    and the full time of the process (interpreter start, imports, quit).
+
+    The application writes the time to the file, because the windowed
+    (PyInstaller -w) build has no stdout.
+
+    Usage: python bench_startup.py [--runs N] [--max-ms MS] [--exe PATH]
+    The exit code is 1 if the median time to show the window exceeds MS
+    (BUDGET_MS by default).
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PATH = os.path.dirname(os.path.realpath(__file__))
+
+# Budget of the time to show the window from source (median, ms). The window
+# is shown in about 190 ms on the reference host (one CPU, offscreen Qt),
+# the budget leaves room for a slower machine, but not for a regression
+# like the synchronous port scan (seconds).
+BUDGET_MS = 500
+
+
+def measure(runs=5, exe=None, timeout=60):
+    """ Return list of (window_ms, process_ms).
+    The application runs in the temporary directory with the log in it,
+    so nothing is written to the source tree.
+    """
+    if exe:
+        command = [os.path.abspath(exe)]
+    else:
+        command = [sys.executable, os.path.join(PATH, 'proxyui.py')]
+
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        report = os.path.join(workdir, "startup.txt")
+        command += ['--benchmark-startup', report, '--log', os.path.join(workdir, "proxyui.log")]
+        for _ in range(runs):
+            if os.path.exists(report):
+                os.remove(report)
+            start = time.perf_counter()
+            subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           timeout=timeout, cwd=workdir)
+            process_ms = (time.perf_counter() - start) * 1000
+            output = ""
+            if os.path.exists(report):
+                with open(report) as f:
+                    output = f.read()
+            match = re.search(r"startup: ([\d.]+) ms", output)
+            if not match:
+                raise RuntimeError("Application did not report startup time")
+            results.append((float(match.group(1)), process_ms))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup-time benchmark of proxyui")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float, default=BUDGET_MS,
+                        help="fail if the median time to show the window is greater (0 - no limit)")
+    parser.add_argument('--exe', help="packaged application (PyInstaller) instead of proxyui.py")
+    args = parser.parse_args(argv)
+
+    results = measure(args.runs, args.exe)
+    window = [r[0] for r in results]
+    process = [r[1] for r in results]
+    print("window shown: median {:.1f} ms, min {:.1f} ms, max {:.1f} ms".format(
+        statistics.median(window), min(window), max(window)))
+    print("process:      median {:.1f} ms, min {:.1f} ms, max {:.1f} ms".format(
+        statistics.median(process), min(process), max(process)))
+
+    if args.max_ms and statistics.median(window) > args.max_ms:
+        print("FAIL: startup is longer than {} ms".format(args.max_ms))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
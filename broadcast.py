@@ -0,0 +1,262 @@
+""" Live broadcast of relay frames to remote viewers.
+
+    Every frame is encoded once and sent to the UDP (multicast) group
+    and to all TCP subscribers. Each TCP subscriber has a bounded buffer;
+    the subscriber which can't keep up with the relay is disconnected.
+
+    Format of frame (network byte order):
+    | Magic "DG" | Version (1 byte) | Seq (4 bytes) | Time (8 bytes, double) |
+    | Number inputs (2 bytes) | Number outputs (2 bytes) | Inputs (2 bytes * N) | Outputs (2 bytes * M) |
+
+    Usage: python broadcast.py (--udp GROUP:PORT | --tcp HOST:PORT)
+"""
+
+import argparse
+from collections import deque, namedtuple
+import ipaddress
+import socket
+import struct
+import sys
+import threading
+import time
+
+MAGIC = b"DG"
+VERSION = 1
+
+HEADER = struct.Struct("!2sBIdHH")
+
+Frame = namedtuple("Frame", "seq time inputs outputs")
+
+
+def encode_frame(seq, inputs, outputs, timestamp=None):
+    if timestamp is None:
+        timestamp = time.time()
+    header = HEADER.pack(MAGIC, VERSION, seq & 0xFFFFFFFF, timestamp, len(inputs), len(outputs))
+    values = struct.pack("!{}h".format(len(inputs) + len(outputs)), *inputs, *outputs)
+    return header + values
+
+
+def decode_frame(data):
+    magic, version, seq, timestamp, n_input, n_output = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Unknown frame format")
+    values = struct.unpack_from("!{}h".format(n_input + n_output), data, HEADER.size)
+    return Frame(seq, timestamp, list(values[:n_input]), list(values[n_input:]))
+
+
+def frame_size(header):
+    """ Return full size of frame by its header """
+    n_input, n_output = HEADER.unpack_from(header)[-2:]
+    return HEADER.size + 2 * (n_input + n_output)
+
+
+def parse_address(text):
+    host, port = text.rsplit(':', 1)
+    return (host, int(port))
+
+
+class _Client:
+    """ TCP subscriber with the bounded buffer of frames """
+
+    def __init__(self, sock, max_frames):
+        self.sock = sock
+        self.frames = deque()
+        self.max_frames = max_frames
+        self.cond = threading.Condition()
+        self.closed = False
+
+    def put(self, frame):
+        """ Return False if the client is too slow """
+        with self.cond:
+            if len(self.frames) >= self.max_frames:
+                return False
+            self.frames.append(frame)
+            self.cond.notify()
+        return True
+
+    def run(self):
+        try:
+            while True:
+                with self.cond:
+                    while not self.frames and not self.closed:
+                        self.cond.wait()
+                    if self.closed:
+                        return
+                    frames = b"".join(self.frames)
+                    self.frames.clear()
+                self.sock.sendall(frames)
+        except OSError:
+            pass
+        finally:
+            self.sock.close()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        # Wake the thread blocked in sendall by the stalled subscriber
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class FramePublisher:
+    """ This class publishes frames to the UDP group and TCP subscribers.
+
+    :param udp: (group, port) of UDP multicast (or unicast) destination
+    :param tcp: (host, port) to accept TCP subscribers
+    :param max_frames: size of buffer of TCP subscriber
+    :param ttl: time to live of multicast datagrams
+    """
+
+    def __init__(self, udp=None, tcp=None, max_frames=16, ttl=1):
+        self.udp = udp
+        self.max_frames = max_frames
+        self.clients = []
+        self.dropped = 0
+
+        self.udp_sock = None
+        if udp:
+            self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+
+        self.server = None
+        if tcp:
+            self.server = socket.create_server(tcp)
+            self._accepter = threading.Thread(target=self._accept, daemon=True)
+            self._accepter.start()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """ Create publisher from settings {"udp": "GROUP:PORT", "tcp": "HOST:PORT"} """
+        if not settings or not (settings.get('udp') or settings.get('tcp')):
+            return None
+        return cls(
+            udp=parse_address(settings['udp']) if settings.get('udp') else None,
+            tcp=parse_address(settings['tcp']) if settings.get('tcp') else None,
+            max_frames=settings.get('max_frames', 16)
+        )
+
+    @property
+    def address(self):
+        """ Address of TCP server """
+        return self.server.getsockname() if self.server else None
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = _Client(sock, self.max_frames)
+            self.clients.append(client)
+            threading.Thread(target=client.run, daemon=True).start()
+
+    def publish(self, seq, inputs, outputs, timestamp=None):
+        frame = encode_frame(seq, inputs, outputs, timestamp)
+        if self.udp_sock:
+            try:
+                self.udp_sock.sendto(frame, self.udp)
+            except OSError:
+                pass
+        for client in list(self.clients):
+            if client.closed or not client.put(frame):
+                self.clients.remove(client)
+                if not client.closed:
+                    self.dropped += 1
+                client.close()
+        return frame
+
+    def close(self):
+        if self.udp_sock:
+            self.udp_sock.close()
+        if self.server:
+            # close() does not wake accept() on Linux, so the port stays bound
+            try:
+                self.server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.server.close()
+            self._accepter.join()
+        for client in self.clients:
+            client.close()
+        self.clients = []
+
+
+class UdpSubscriber:
+    """ Receive frames from the UDP group (multicast or unicast address) """
+
+    def __init__(self, address, interface="0.0.0.0", timeout=None):
+        group, port = address
+        group = socket.gethostbyname(group)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.settimeout(timeout)
+        if _is_multicast(group):
+            self.sock.bind(("", port))
+            mreq = socket.inet_aton(group) + socket.inet_aton(interface)
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        else:
+            self.sock.bind((group, port))
+
+    def receive(self):
+        data = self.sock.recv(65536)
+        return decode_frame(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class TcpSubscriber:
+    """ Receive frames from the TCP publisher """
+
+    def __init__(self, address, timeout=None):
+        self.sock = socket.create_connection(address, timeout)
+        self.rfile = self.sock.makefile('rb')
+
+    def receive(self):
+        header = self.rfile.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ConnectionError("Publisher closed the connection")
+        data = header + self.rfile.read(frame_size(header) - HEADER.size)
+        return decode_frame(data)
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+
+def _is_multicast(host):
+    try:
+        return ipaddress.ip_address(host).is_multicast
+    except ValueError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show frames broadcasted by the relay")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--udp', help="GROUP:PORT")
+    group.add_argument('--tcp', help="HOST:PORT")
+    args = parser.parse_args(argv)
+
+    if args.udp:
+        subscriber = UdpSubscriber(parse_address(args.udp))
+    else:
+        subscriber = TcpSubscriber(parse_address(args.tcp))
+
+    try:
+        while True:
+            frame = subscriber.receive()
+            print("{0.seq}: in={0.inputs} out={0.outputs}".format(frame))
+    except (KeyboardInterrupt, ConnectionError):
+        pass
+    finally:
+        subscriber.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
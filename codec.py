@@ -0,0 +1,215 @@
+""" Codecs of the serial protocols compiled from declarative layouts.
+
+    The layout is the dict (see PROTOCOLS, section "protocols" of sysconf.json):
+    header      - ASCII header of message, e.g. "$CM"
+    count_byte  - number of channels (1 byte) after the header
+    imax_byte   - max current, A (1 byte) after the number of channels
+    index_byte  - number of channel (from 1, 1 byte) before every value
+    value_bytes - width of value: 1, 2 or 4 bytes
+    signed      - values are signed
+    byteorder   - "big" or "little"
+    checksum    - algorithm of checksum byte (see CHECKSUMS) or "none"
+    end         - ASCII terminator
+
+    | Header | Count | Imax | Index | Value | ... | Index | Value | Checksum | End |
+
+    The codec compiles the layout into struct formats once per number
+    of channels, so a message is encoded or decoded by one call of struct.
+"""
+
+from functools import reduce
+import operator
+import struct
+
+CHECKSUMS = {
+    "sum8": lambda data: sum(data) & 0xFF,
+    "xor8": lambda data: reduce(operator.xor, data, 0),
+    "none": None
+}
+
+VALUE_CODES = {1: 'b', 2: 'h', 4: 'i'}
+BYTEORDERS = {"big": ">", "little": "<"}
+
+DEFAULTS = {
+    "header": "",
+    "count_byte": False,
+    "imax_byte": False,
+    "index_byte": True,
+    "value_bytes": 2,
+    "signed": True,
+    "byteorder": "big",
+    "checksum": "sum8",
+    "end": "\r\n"
+}
+
+PROTOCOLS = {
+    # ADC
+    "input": {"header": "$01"},
+    # Compensator KF1/1M (CM2/AMK21), the number of channels is set by settings
+    "CM2": {"header": "$CM", "count_byte": True}
+}
+
+
+class Codec:
+    """ Encoder and decoder of the protocol
+
+    :param layout: dict of the layout (missed keys are taken from DEFAULTS)
+    :param imax: value of imax byte
+    """
+
+    def __init__(self, layout, imax=0):
+        unknown = set(layout) - set(DEFAULTS)
+        if unknown:
+            raise ValueError("Unknown keys of protocol: {}".format(", ".join(sorted(unknown))))
+        spec = dict(DEFAULTS, **layout)
+        if spec['value_bytes'] not in VALUE_CODES:
+            raise ValueError("Wrong width of value: {}".format(spec['value_bytes']))
+        if spec['checksum'] not in CHECKSUMS:
+            raise ValueError("Unknown checksum: {}".format(spec['checksum']))
+        if spec['byteorder'] not in BYTEORDERS:
+            raise ValueError("Unknown byte order: {}".format(spec['byteorder']))
+
+        self.layout = spec
+        self.imax = imax
+        self.header = spec['header'].encode('ascii')
+        self.end = spec['end'].encode('ascii')
+        self.indexed = spec['index_byte']
+        self.checksum = CHECKSUMS[spec['checksum']]
+
+        code = VALUE_CODES[spec['value_bytes']]
+        self.value = code if spec['signed'] else code.upper()
+        self.item = ('B' if self.indexed else '') + self.value
+        self.order = BYTEORDERS[spec['byteorder']]
+        self.item_size = struct.calcsize(self.order + self.item)
+
+        self.prefix = [self.header]
+        self.prefix_format = "{}s".format(len(self.header))
+        if spec['count_byte']:
+            self.prefix.append(0)
+            self.prefix_format += "B"
+        if spec['imax_byte']:
+            self.prefix.append(imax)
+            self.prefix_format += "B"
+        self.prefix_size = struct.calcsize(self.order + self.prefix_format)
+        self.suffix_size = len(self.end) + (1 if self.checksum else 0)
+
+        # The checksum byte with the terminator for every value of checksum
+        if self.checksum:
+            self.tails = [bytes((cs,)) + self.end for cs in range(256)]
+
+        self._encoders = {}
+        self._decoders = {}
+        self._args = {}
+
+    def _encoder(self, n):
+        encoder = self._encoders.get(n)
+        if encoder is None:
+            encoder = struct.Struct(self.order + self.prefix_format + self.item * n)
+            self._encoders[n] = encoder
+        return encoder
+
+    def _decoder(self, n):
+        decoder = self._decoders.get(n)
+        if decoder is None:
+            decoder = struct.Struct(self.order + self.item * n)
+            self._decoders[n] = decoder
+        return decoder
+
+    def _frame_args(self, n):
+        """ Return preallocated arguments of the full frame with n channels """
+        args = self._args.get(n)
+        if args is None:
+            args = list(self.prefix)
+            if self.layout['count_byte']:
+                args[1] = n
+            if self.indexed:
+                for index in range(1, n + 1):
+                    args.extend((index, 0))
+            else:
+                args.extend([0] * n)
+            self._args[n] = args
+        return args
+
+    def _finish(self, body):
+        if not self.checksum:
+            return body + self.end
+        return body + self.tails[self.checksum(body)]
+
+    def encode(self, values, channels=None):
+        """ Return message with values. If channels (numbers from 1) are
+        specified, then only these channels are included in the message
+        (the layout must have index byte).
+        """
+        if channels is None:
+            n = len(values)
+            args = self._frame_args(n)
+            start = len(self.prefix)
+            if self.indexed:
+                args[start + 1::2] = values
+            else:
+                args[start:] = values
+            return self._finish(self._encoder(n).pack(*args))
+
+        if not self.indexed:
+            raise ValueError("Protocol without index byte can't send part of channels")
+        n = len(channels)
+        args = list(self.prefix)
+        if self.layout['count_byte']:
+            args[1] = n
+        for index in channels:
+            args.append(index)
+            args.append(values[index - 1])
+        return self._finish(self._encoder(n).pack(*args))
+
+    def size(self, prefix, channels=0):
+        """ Return size of the message by its first prefix_size bytes.
+        The number of channels is taken from the count byte or from channels.
+        """
+        if self.layout['count_byte']:
+            channels = prefix[len(self.header)]
+        return self.prefix_size + channels * self.item_size + self.suffix_size
+
+    def count(self, message):
+        """ Return the number of channels in the message """
+        return (len(message) - self.prefix_size - self.suffix_size) // self.item_size
+
+    def decode(self, message):
+        """ Return list of values of the message (without check) """
+        values = self._decoder(self.count(message)).unpack_from(message, self.prefix_size)
+        if self.indexed:
+            return list(values[1::2])
+        return list(values)
+
+    def check(self, message):
+        """ Validate header, length, terminator and checksum of the message """
+        data = len(message) - self.prefix_size - self.suffix_size
+        if data < 0 or data % self.item_size:
+            return False
+        if not message.startswith(self.header) or not message.endswith(self.end):
+            return False
+        if not self.checksum:
+            return True
+        end = len(message) - self.suffix_size
+        return self.checksum(memoryview(message)[:end]) == message[end]
+
+
+def output_layout(settings, protocols=None):
+    """ Return layout of the compensator protocol selected by settings:
+    "header" is the name of protocol, "channels_byte" and "imax_byte"
+    switch the count and imax bytes
+    """
+    protocols = protocols or settings.get('protocols') or PROTOCOLS
+    name = settings.get('header', 'CM2')
+    if name not in protocols:
+        raise ValueError("Unknown protocol: {}".format(name))
+    layout = dict(protocols[name])
+    if 'channels_byte' in settings:
+        layout['count_byte'] = settings['channels_byte']
+    if 'imax_byte' in settings:
+        layout['imax_byte'] = settings['imax_byte']
+    return layout
+
+
+def input_layout(settings):
+    protocols = settings.get('protocols') or PROTOCOLS
+    return protocols.get('input', PROTOCOLS['input'])
@@ -0,0 +1,198 @@
+""" Export of the relay captures (see recorder) for offline analysis.
+
+    The capture is read in chunks of records, so memory does not depend
+    on the length of the capture. Formats:
+    npy     - PREFIX_time.npy (float64), PREFIX_seq.npy (uint32),
+              PREFIX_inputs.npy and PREFIX_outputs.npy (int16, records x channels)
+    csv     - PREFIX.csv with columns time, seq, in1..inN, out1..outM
+    parquet - PREFIX.parquet with the same columns (requires pyarrow)
+
+    Summary statistics (see runstats) is calculated over all records
+    of the selected range, regardless of decimation.
+
+    Usage: python export.py CAPTURE PREFIX [--format npy] [--start TIME] [--stop TIME]
+                            [--every N] [--stats STATS.csv]
+"""
+
+import argparse
+import ast
+import csv
+from datetime import datetime
+import struct
+import sys
+
+from recorder import Capture, RECORD
+from runstats import RunningStats, write_csv
+
+FORMATS = ("npy", "csv", "parquet")
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+class NpyWriter:
+    """ This class streams rows of the array to the .npy file.
+    The number of rows must be known before writing.
+    """
+
+    def __init__(self, path, descr, shape):
+        self.path = path
+        self.file = open(path, 'wb')
+        header = "{{'descr': '{}', 'fortran_order': False, 'shape': {}, }}".format(descr, shape)
+        # Data is aligned to 64 bytes
+        length = len(NPY_MAGIC) + 2 + len(header) + 1
+        header += " " * (-length % 64) + "\n"
+        self.file.write(NPY_MAGIC + struct.pack("<H", len(header)) + header.encode('latin1'))
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+
+def read_npy(path):
+    """ Return (descr, shape, data) of the .npy file written by NpyWriter """
+    with open(path, 'rb') as f:
+        if f.read(len(NPY_MAGIC)) != NPY_MAGIC:
+            raise ValueError("{} is not the .npy file".format(path))
+        length, = struct.unpack("<H", f.read(2))
+        header = ast.literal_eval(f.read(length).decode('latin1'))
+        return header['descr'], header['shape'], f.read()
+
+
+class NpyExporter:
+    def __init__(self, prefix, capture, rows):
+        n, m = capture.inputs, capture.outputs
+        self.columns = [
+            (NpyWriter(prefix + "_time.npy", '<f8', (rows,)), 0, 8),
+            (NpyWriter(prefix + "_seq.npy", '<u4', (rows,)), 8, RECORD.size),
+            (NpyWriter(prefix + "_inputs.npy", '<i2', (rows, n)), RECORD.size, RECORD.size + 2 * n),
+            (NpyWriter(prefix + "_outputs.npy", '<i2', (rows, m)), RECORD.size + 2 * n, capture.size)
+        ]
+        self.size = capture.size
+        self.paths = [writer.path for writer, _, _ in self.columns]
+
+    def write(self, data, rows, records):
+        # Records are little endian as .npy, so bytes are copied without decoding
+        size = self.size
+        for writer, start, stop in self.columns:
+            writer.write(b"".join(data[i * size + start:i * size + stop] for i in rows))
+
+    def close(self):
+        for writer, _, _ in self.columns:
+            writer.close()
+
+
+def _names(capture):
+    return (["time", "seq"] + ["in{}".format(i) for i in range(1, capture.inputs + 1)]
+            + ["out{}".format(i) for i in range(1, capture.outputs + 1)])
+
+
+class CsvExporter:
+    def __init__(self, prefix, capture, rows):
+        self.paths = [prefix + ".csv"]
+        self.file = open(self.paths[0], 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(_names(capture))
+
+    def write(self, data, rows, records):
+        self.writer.writerows((records[i][0], records[i][1]) + records[i][2] + records[i][3] for i in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExporter:
+    """ Every chunk is written as the row group of the Parquet file """
+
+    def __init__(self, prefix, capture, rows):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("pyarrow is required to export Parquet") from None
+        self.pa = pyarrow
+        self.names = _names(capture)
+        types = [pyarrow.float64(), pyarrow.uint32()] + [pyarrow.int16()] * (len(self.names) - 2)
+        self.schema = pyarrow.schema(list(zip(self.names, types)))
+        self.paths = [prefix + ".parquet"]
+        self.writer = pyarrow.parquet.ParquetWriter(self.paths[0], self.schema)
+
+    def write(self, data, rows, records):
+        columns = zip(*((records[i][0], records[i][1]) + records[i][2] + records[i][3] for i in rows))
+        arrays = [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)]
+        if arrays:
+            self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+EXPORTERS = {"npy": NpyExporter, "csv": CsvExporter, "parquet": ParquetExporter}
+
+
+def export(path, prefix, fmt="npy", start=None, stop=None, every=1, chunk=4096, stats=False):
+    """ Export records of the capture between start and stop times (seconds
+    since the epoch), every N-th record only.
+    Returns (paths of files, statistics {"input": result, "output": result} or None)
+    """
+    if every < 1:
+        raise ValueError("every must be at least 1")
+    with Capture(path) as capture:
+        first, last = capture.select(start, stop)
+        rows = (last - first + every - 1) // every
+        exporter = EXPORTERS[fmt](prefix, capture, rows)
+        channel_stats = {"input": RunningStats(), "output": RunningStats()} if stats else None
+        decode = stats or fmt != "npy"
+        try:
+            for index, data in capture.chunks(first, last, chunk):
+                count = len(data) // capture.size
+                # Keep every N-th record counting from the first selected one
+                selected = range((first - index) % every, count, every)
+                records = capture.decode(data) if decode else None
+                exporter.write(data, selected, records)
+                if channel_stats:
+                    for record in records:
+                        channel_stats["input"].update(record[2])
+                        channel_stats["output"].update(record[3])
+        finally:
+            exporter.close()
+    if channel_stats:
+        channel_stats = {name: s.result() for name, s in channel_stats.items()}
+    return exporter.paths, channel_stats
+
+
+def parse_time(text):
+    """ Return timestamp by ISO date and time or seconds since the epoch """
+    if text is None:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the relay capture")
+    parser.add_argument('capture')
+    parser.add_argument('prefix', help="path of output files without extension")
+    parser.add_argument('--format', choices=FORMATS, default='npy')
+    parser.add_argument('--start', help="ISO time or seconds since the epoch")
+    parser.add_argument('--stop', help="ISO time or seconds since the epoch")
+    parser.add_argument('--every', type=int, default=1, help="keep every N-th record")
+    parser.add_argument('--chunk', type=int, default=4096, help="records per chunk")
+    parser.add_argument('--stats', metavar='CSV', help="write per channel statistics")
+    args = parser.parse_args(argv)
+
+    paths, stats = export(args.capture, args.prefix, args.format, parse_time(args.start),
+                          parse_time(args.stop), args.every, args.chunk, bool(args.stats))
+    if stats:
+        write_csv(args.stats, stats)
+        paths.append(args.stats)
+    for path in paths:
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+""" Processing stages of the relay between the ADC and the compensator.
+
+    Every stage is the subclass of Handler. It declares the number of
+    channels it needs and produces, and transforms the typed buffer
+    (array of TYPECODE) in place:
+
+        class Gain(Handler):
+            def __init__(self, gain=1.0):
+                self.gain = gain
+
+            def process(self, buffer, count):
+                for i in range(count):
+                    buffer[i] = int(buffer[i] * self.gain)
+                return count
+
+    The buffer is allocated once by the chain, so stages must not keep
+    references to it between cycles.
+
+    Stages are found by name in the registry. Third-party packages add
+    them with the entry point in the group "degaus.handlers":
+
+        [project.entry-points."degaus.handlers"]
+        gain = "mypackage:Gain"
+
+    The chain is configured in sysconf.json (section "relay"):
+
+        "handlers": [
+            {"name": "voltage"},
+            {"name": "gain", "gain": 0.5},
+            {"name": "pattern"}
+        ]
+
+    Other keys of the item are passed to the constructor of the stage.
+    The "pattern" item marks the place of the pattern of the relay
+    (it is appended to the end if missing).
+"""
+
+from array import array
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINTS = "degaus.handlers"
+TYPECODE = 'l'
+# Max number of channels of the protocols
+MAX_CHANNELS = 150
+
+DEFAULT_CHAIN = [{"name": "voltage"}, {"name": "pattern"}]
+
+_registry = {}
+_discovered = False
+
+
+class Handler:
+    """ Base class of the processing stage
+
+    :attr inputs: number of channels the stage needs (0 - any)
+    :attr outputs: number of channels the stage produces (0 - same as inputs)
+    """
+
+    inputs = 0
+    outputs = 0
+
+    def process(self, buffer, count):
+        """ Transform first count values of the buffer in place
+        and return the number of the output values
+        """
+        return count
+
+    def __call__(self, data):
+        buffer = array(TYPECODE, data)
+        buffer.extend([0] * max(self.outputs - len(data), 0))
+        count = self.process(buffer, len(data))
+        return buffer[:count].tolist()
+
+
+def register(name, handler=None):
+    """ Register the stage class by name. It can be used as decorator """
+    if handler is None:
+        return lambda cls: register(name, cls)
+    _registry[name] = handler
+    return handler
+
+
+def _entry_points():
+    from importlib import metadata
+
+    eps = metadata.entry_points()
+    if hasattr(eps, 'select'):
+        return eps.select(group=ENTRY_POINTS)
+    return eps.get(ENTRY_POINTS, [])
+
+
+def discover():
+    """ Load stages of the installed packages (once) """
+    global _discovered
+
+    if _discovered:
+        return
+    _discovered = True
+    for ep in _entry_points():
+        if ep.name in _registry:
+            continue
+        try:
+            _registry[ep.name] = ep.load()
+        except Exception:
+            logger.exception("Handler '%s' is not loaded", ep.name)
+
+
+def get(name):
+    if name not in _registry:
+        discover()
+    try:
+        return _registry[name]
+    except KeyError:
+        raise ValueError("Unknown handler: {}".format(name)) from None
+
+
+def available():
+    discover()
+    return sorted(_registry)
+
+
+class PatternHandler(Handler):
+    """ This class represents a hook. 
+    It changes data in the message with specified pattern 
+    and returns a new data.
+    """
+
+    def __init__(self, pattern, channels):
+        self.channels = channels
+        self.pattern = pattern[:channels]
+        self.outputs = len(self.pattern)
+        self.live = [i for i, state in enumerate(self.pattern) if state == 'L']
+        self.inputs = 1 if self.live else 0
+
+    def __call__(self, data):
+        return self._handle(data)
+
+    def _handle(self, data: list) -> list:
+        value = data[0]
+        data_changed = [value if i == 'L' else i for i in self.pattern]
+        return data_changed
+
+    def process(self, buffer, count):
+        value = buffer[0] if self.live else 0
+        for i, state in enumerate(self.pattern):
+            buffer[i] = value if state == 'L' else state
+        return self.outputs
+
+
+@register('voltage')
+class VoltageHandler(Handler):
+    """ This handler convert all values in data to current
+    and return list of values"""
+    
+    def __init__(self, imax=9.99, vmax=300, ku=1):
+        self.imax = imax
+        self.vmax = vmax
+        self.ku = ku    
+
+    def __call__(self, data):
+        return self._handler(data)
+
+    def _handler(self, data):
+        res = []
+        for value in data:
+            res.append(int((self.imax / self.vmax) * self.ku * value * 100))
+        return res
+
+    def process(self, buffer, count):
+        scale = (self.imax / self.vmax) * self.ku
+        for i in range(count):
+            buffer[i] = int(scale * buffer[i] * 100)
+        return count
+
+
+class HandlerChain:
+    """ This class runs stages over one preallocated buffer.
+    The pattern stage can be replaced between cycles (see set_pattern).
+
+    :param stages: list of stages, None marks the place of the pattern
+    """
+
+    def __init__(self, stages, size=MAX_CHANNELS):
+        if None not in stages:
+            stages = list(stages) + [None]
+        self.stages = list(stages)
+        self.slot = self.stages.index(None)
+        self.buffer = array(TYPECODE, [0] * size)
+        self._check()
+
+    def _check(self):
+        channels = 0
+        for stage in self.stages:
+            if stage is None:
+                # Pattern changes the number of channels
+                channels = 0
+                continue
+            if stage.inputs and channels and channels < stage.inputs:
+                raise ValueError("{} needs {} channels, but gets {}".format(
+                    type(stage).__name__, stage.inputs, channels))
+            if max(stage.inputs, stage.outputs) > len(self.buffer):
+                raise ValueError("{} needs more than {} channels".format(
+                    type(stage).__name__, len(self.buffer)))
+            channels = stage.outputs or channels
+
+    def set_pattern(self, handler):
+        self.stages[self.slot] = handler
+
+    def process(self, data):
+        """ Load data to the buffer, run stages and return number of output values """
+        buffer = self.buffer
+        count = len(data)
+        if count > len(buffer):
+            raise ValueError("Too many channels: {}".format(count))
+        for i, value in enumerate(data):
+            buffer[i] = value
+        for stage in self.stages:
+            if stage is None:
+                continue
+            if count < stage.inputs:
+                raise ValueError("{} needs {} channels, but gets {}".format(
+                    type(stage).__name__, stage.inputs, count))
+            count = stage.process(buffer, count)
+        return count
+
+    def __call__(self, data):
+        count = self.process(data)
+        return self.buffer[:count].tolist()
+
+
+def build_chain(config, settings):
+    """ Create the chain by items of sysconf.json (see module docs) """
+    stages = []
+    for item in config or DEFAULT_CHAIN:
+        options = dict(item)
+        name = options.pop('name')
+        if name == 'pattern':
+            stages.append(None)
+            continue
+        if name == 'voltage':
+            options.setdefault('imax', settings['imax'])
+        stages.append(get(name)(**options))
+    return HandlerChain(stages)
@@ -3,9 +3,12 @@ import sys
 import collections
 
 from PyQt5 import QtCore
-from PyQt5.QtGui import *
-from PyQt5.QtWidgets import *
+from PyQt5.QtWidgets import (
+    QAbstractButton, QApplication, QButtonGroup, QFormLayout, QGridLayout, QHBoxLayout,
+    QLabel, QLineEdit, QPushButton, QRadioButton, QStackedLayout, QVBoxLayout, QWidget
+)
 
+from profiling import timed
 
 class PanelManager:
     def __init__(self, parent=None, size=None, *args, **kwargs):
@@ -26,6 +29,7 @@ class PanelManager:
         def _on_switch_panel():
             current = self.stack.currentIndex()
             if current == 0:
+                self.control()
                 self.stack.setCurrentIndex(1)
                 self.buttonAll.setVisible(True)
                 self.parent.setTitle(self.modes[1])
@@ -46,7 +50,7 @@ class PanelManager:
             else:
                 raise ValueError("Dont find group name")
             #current = self.stack.currentWidget()
-            for i in range(2):
+            for i in range(self.stack.count()):
                 self.stack.widget(i).set_page(self.page)
 
 
@@ -54,7 +58,7 @@ class PanelManager:
 
             text = self.buttonAll.text()
             self.pattern = [text for i in range(self.size)]
-            self.pcontrol.set_data(self.pattern)
+            self.control().set_data(self.pattern)
 
         self.parent.setTitle('Амперметры')
 
@@ -70,9 +74,9 @@ class PanelManager:
         self.buttonSwitch = SwitchButton(labels=["Настройки", "Амперметры"])
         self.buttonSwitch.setMinimumWidth(120)
 
-        # Panels
+        # Panels (the control panel is created on the first switch to it)
         self.pview = PanelView(data=self.values)
-        self.pcontrol = PanelControl(data=self.pattern)
+        self.pcontrol = None
         
         # Layouts
         hbox = QHBoxLayout()
@@ -83,7 +87,6 @@ class PanelManager:
 
         stack = self.stack = QStackedLayout()
         stack.insertWidget(0, self.pview)
-        stack.insertWidget(1, self.pcontrol)
         stack.setCurrentIndex(0)
 
         layout = self.layout = QVBoxLayout(self.parent)
@@ -105,11 +108,20 @@ class PanelManager:
             self.radiobox_enabled(False)
         # Change pattern
         self.pattern = [self.states[2] for i in range(self.size)]
-        self.pcontrol.set_data(self.pattern)
+        if self.pcontrol:
+            self.pcontrol.set_data(self.pattern)
         # Change values
         self.values = ["-" for i in range(self.size)]
         self.pview.set_data(self.values)
 
+    def control(self):
+        """ Return the control panel, create it if it is not created yet """
+        if self.pcontrol is None:
+            self.pcontrol = PanelControl(data=self.pattern)
+            self.pcontrol.set_page(self.page)
+            self.stack.insertWidget(1, self.pcontrol)
+        return self.pcontrol
+
     def show_panelview(self):
         self.stack.setCurrentIndex(0)
         self.parent.setTitle(self.modes[0])
@@ -118,9 +130,20 @@ class PanelManager:
     def fetch_pattern(self):
         return self.pattern
 
-    def view_show(self, data):
+    def set_pattern(self, pattern):
+        """ Show the pattern (e.g. of the running relay) on the control panel """
+        self.pattern = list(pattern)
+        if self.pcontrol:
+            self.pcontrol.set_data(self.pattern)
+
+    def view_show(self, data, alarms=None):
+        if alarms is not None:
+            self.pview.alarms = set(alarms)
         self.pview.set_data(data)
 
+    def view_statistics(self, result):
+        self.pview.set_statistics(result)
+
     def view_clear(self):
         self.pview.clear()
 
@@ -189,6 +212,8 @@ class PanelView(PanelBase):
     def __init__(self, parent=None, data=None, *args, **kwargs):
         super().__init__(parent, *args, **kwargs)
         self.data = data
+        self.alarms = set()
+        self.statistics = None
         self._createUI(NamedEdit)
 
         if self.data:
@@ -196,15 +221,34 @@ class PanelView(PanelBase):
 
     def clear(self):
         self.data = ['-' for v in self.data]
+        self.alarms = set()
+        self.statistics = None
+        self.update_()
+
+    def set_statistics(self, result):
+        """ Show running statistics of channels in tooltips """
+        self.statistics = result
         self.update_()
 
+    @timed('gui.PanelView.update_')
     def update_(self):
-        for delegate, value in zip(self.delegates, self.data[self.page * 50 : self.page * 50 + 50]):
+        first = self.page * 50
+        for channel, (delegate, value) in enumerate(zip(self.delegates, self.data[first : first + 50]), first + 1):
             if isinstance(value, int):
                 txt = '{0:=6.2f}'.format(value/100)
             else:
                 txt = value
             delegate.display(txt)
+            delegate.setAlarm(channel in self.alarms)
+            delegate.setToolTip(self._tooltip(channel - 1))
+
+    def _tooltip(self, index):
+        result = self.statistics
+        if not result or index >= len(result.get('mean', [])):
+            return ""
+        return "мин: {:.2f}\nмакс: {:.2f}\nсреднее: {:.2f}\nСКО: {:.2f}".format(
+            result['min'][index] / 100, result['max'][index] / 100,
+            result['mean'][index] / 100, result['std'][index] / 100)
 
 
 class PanelControl(PanelBase):
@@ -293,6 +337,7 @@ class NamedEdit(NamedWidget):
         self.createUi()
 
     def createUi(self):
+        self.alarm = False
         self.edit = edit = QLineEdit()
         self.edit.setText('-')
         edit.setReadOnly(True)
@@ -304,6 +349,12 @@ class NamedEdit(NamedWidget):
 
     def clear(self):
         self.edit.setText('-')
+        self.setAlarm(False)
+
+    def setAlarm(self, alarm):
+        if alarm != self.alarm:
+            self.alarm = alarm
+            self.edit.setStyleSheet("background-color: #f08080" if alarm else "")
 
     def display(self, value):
         self.edit.setText(value)
@@ -0,0 +1,249 @@
+""" Profiling hooks switchable at runtime.
+
+    StageTimers accumulate the time of relay stages (read, parse, handle,
+    encode, write) and GUI refresh with a few nanosecond clock calls per
+    stage. SamplingProfiler samples stacks of all threads for N seconds,
+    so it also sees the relay thread and the Qt thread at once.
+    Both write a text report which the customer can send back.
+
+    Enable timers with the environment variable DEGAUS_PROFILE=1,
+    the --profile option of proxyui or the menu item.
+    Reports are written to DEGAUS_REPORTS or next to the application.
+"""
+
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+
+# Directory of reports, see report_path()
+REPORTS = os.environ.get('DEGAUS_REPORTS', '')
+
+clock = time.perf_counter_ns
+
+
+class StageTimers:
+    """ Count, total, min and max time (ns) of named stages """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = {}
+
+    def mark(self, name, start):
+        """ Add time since start to the stage and return current time """
+        now = clock()
+        if self.enabled:
+            elapsed = now - start
+            stage = self.stages.get(name)
+            if stage is None:
+                self.stages[name] = [1, elapsed, elapsed, elapsed]
+            else:
+                stage[0] += 1
+                stage[1] += elapsed
+                if elapsed < stage[2]:
+                    stage[2] = elapsed
+                if elapsed > stage[3]:
+                    stage[3] = elapsed
+        return now
+
+    def reset(self):
+        self.stages = {}
+
+    def report(self):
+        lines = ["{:<24}{:>10}{:>14}{:>12}{:>12}{:>12}".format(
+            "stage", "count", "total, ms", "mean, us", "min, us", "max, us")]
+        for name, (count, total, low, high) in sorted(self.stages.items()):
+            lines.append("{:<24}{:>10}{:>14.3f}{:>12.1f}{:>12.1f}{:>12.1f}".format(
+                name, count, total / 1e6, total / count / 1e3, low / 1e3, high / 1e3))
+        return "\n".join(lines)
+
+
+TIMERS = StageTimers(enabled=os.environ.get('DEGAUS_PROFILE', '') not in ('', '0'))
+
+
+def report_path(pattern):
+    """ Return absolute path of the new report by strftime pattern.
+    The directory is REPORTS, the directory of the executable of the frozen
+    application (the sources are extracted to the temporary directory,
+    which is removed on exit) or of the sources. The home directory is
+    used if that one is not writable.
+    """
+    directory = REPORTS
+    if not directory:
+        if getattr(sys, 'frozen', False):
+            directory = os.path.dirname(sys.executable)
+        else:
+            directory = os.path.dirname(os.path.realpath(__file__))
+        if not os.access(directory, os.W_OK):
+            directory = os.path.expanduser("~")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.abspath(os.path.join(directory, time.strftime(pattern)))
+
+
+def timed(name):
+    """ Decorator which adds the time of function to the stage """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TIMERS.enabled:
+                return func(*args, **kwargs)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                TIMERS.mark(name, start)
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler(threading.Thread):
+    """ This class samples stacks of all threads during `seconds`
+    and writes the report to the file.
+    """
+
+    def __init__(self, seconds=30, interval=0.005, path=None, callback=None):
+        super().__init__(daemon=True)
+        self.seconds = seconds
+        self.interval = interval
+        self.path = path or report_path("profile-%Y%m%d-%H%M%S.txt")
+        self.callback = callback
+
+        self.samples = 0
+        self.functions = collections.Counter()
+        self.stacks = collections.Counter()
+
+    def run(self):
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append("{}:{}({})".format(
+                        os.path.basename(code.co_filename), frame.f_lineno, code.co_name))
+                    frame = frame.f_back
+                self.functions.update(set(stack))
+                self.stacks[(names.get(ident, ident),) + tuple(reversed(stack[:8]))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+        self.write()
+        if self.callback:
+            self.callback(self.path)
+
+    def report(self, top=40):
+        lines = ["Samples: {} (interval {} ms)".format(self.samples, self.interval * 1000), "",
+                 "Functions (share of samples, inclusive):"]
+        for name, count in self.functions.most_common(top):
+            lines.append("{:>7.1%}  {}".format(count / max(self.samples, 1), name))
+        lines += ["", "Stacks:"]
+        for stack, count in self.stacks.most_common(top // 2):
+            lines.append("{:>6} [{}] {}".format(count, stack[0], " > ".join(stack[1:])))
+        return "\n".join(lines)
+
+    def write(self):
+        with open(self.path, 'w') as f:
+            f.write(report_header())
+            f.write("Stage timers:\n")
+            f.write(TIMERS.report())
+            f.write("\n\n")
+            f.write(self.report())
+            f.write("\n")
+
+
+def report_header():
+    return "Python {}\nPlatform {}\nTime {}\n\n".format(
+        sys.version.replace("\n", " "), sys.platform, time.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+def write_report(path=None):
+    """ Write report of stage timers only and return its path """
+    path = path or report_path("timers-%Y%m%d-%H%M%S.txt")
+    with open(path, 'w') as f:
+        f.write(report_header())
+        f.write(TIMERS.report())
+        f.write("\n")
+    return path
+
+
+def control(enabled=None, seconds=0):
+    """ Switch stage timers and start the sampling profiler.
+    Returns path of the report which will be written.
+    """
+    if enabled is not None:
+        TIMERS.enabled = enabled
+        if not enabled:
+            return write_report()
+    if seconds:
+        profiler = SamplingProfiler(seconds)
+        profiler.start()
+        return profiler.path
+    return None
+
+
+def run_cprofile(func, seconds, path=None):
+    """ Run func() repeatedly for `seconds` under cProfile and write the report """
+    import cProfile
+    import pstats
+
+    path = path or report_path("cprofile-%Y%m%d-%H%M%S.txt")
+    profiler = cProfile.Profile()
+    deadline = time.monotonic() + seconds
+    profiler.enable()
+    try:
+        while time.monotonic() < deadline:
+            func()
+    finally:
+        profiler.disable()
+    with open(path, 'w') as f:
+        f.write(report_header())
+        pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+    return path
+
+
+def main(argv=None):
+    """ Run the relay with virtual or real ports and write the profile """
+    import argparse
+    # Use the modules imported by the relay, not __main__
+    import profiling
+    import proxy
+
+    parser = argparse.ArgumentParser(description="Profile the relay")
+    parser.add_argument('--port-input', default='VCOM')
+    parser.add_argument('--port-output', default='VCOM')
+    parser.add_argument('--channels', type=int, default=150)
+    parser.add_argument('--imax', type=int, default=10)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--mode', choices=('cprofile', 'sample'), default='cprofile')
+    args = parser.parse_args(argv)
+
+    relay = proxy.Relay({
+        "port_input": args.port_input, "port_output": args.port_output,
+        "imax": args.imax, "channels": args.channels, "channels_byte": True, "interval": 0
+    })
+    relay.set_pattern(['L'] * args.channels)
+    profiling.TIMERS.enabled = True
+    try:
+        if args.mode == 'cprofile':
+            path = profiling.run_cprofile(relay.step, args.seconds)
+        else:
+            profiler = profiling.SamplingProfiler(args.seconds)
+            profiler.start()
+            while profiler.is_alive():
+                relay.step()
+            path = profiler.path
+    finally:
+        relay.close()
+    print("Report: {}".format(path))
+    print(profiling.TIMERS.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,12 +6,24 @@
 """
 
 from collections import deque
+from functools import partial
 import glob
-from functools import reduce
+import logging
 import sys
+import threading
+import time
 
 import serial
 
+import codec
+from handlers import PatternHandler, VoltageHandler, build_chain
+from profiling import TIMERS, clock
+from reconnect import PortUnavailable, ReconnectingPort
+from runstats import DecayingStats, RunningStats
+
+# Optional parts (alarms, broadcast, recording, median of inputs) are
+# imported when they are configured to keep the start of the GUI short
+
 '''
 This protocols for communication between system CM2/AMK21 and CED KF1/1M
 
@@ -30,18 +42,14 @@ Format <Input from ADC>
              +----> Num Channel
 '''
 
-protocols = {
-    "input": {"header": "$01", "end": "\r\n", "count_bytes": False},
-    "output": {
-        "cm": {"header": "$CM", "end": "\r\n", "count_bytes": False},
-        "amk": {"header": "$CM", "end": "\r\n", "count_bytes": True}
-    }
-}
-
+# Default codecs (see codec), the relay compiles them from settings
+INPUT = codec.Codec(codec.PROTOCOLS['input'])
 
 QUEUE = deque(maxlen=1)
 QUEUE_INPUT = deque(maxlen=1)
 
+logger = logging.getLogger(__name__)
+
 
 def scan(n=256):
     if sys.platform.startswith('win'):
@@ -65,49 +73,6 @@ def scan(n=256):
     return result
 
 
-def create_message(values, protocol):
-    """ This function used to create message from data and bytes-string """
-    sequence_bytes = [protocol['header'].encode()]
-    if protocol['count_bytes']:
-        cb = (len(values)).to_bytes(1, byteorder='big')
-        sequence_bytes.append(cb)
-    sequence_bytes.extend(databytes(values))
-    sequence_bytes.append(checksum(sequence_bytes))
-    sequence_bytes.append(protocol['end'].encode())
-    return b"".join(sequence_bytes)
-
-
-def databytes(data):
-    db = []
-    for index, value in enumerate(data, 1):
-        index_byte = index.to_bytes(1, byteorder='big')
-        value_bytes = value.to_bytes(2, byteorder='big', signed=True)
-        db.extend([index_byte, value_bytes])
-    return db
-
-
-def checksum(data, module=256):
-    """ Calculate checksum and return in the bytes """
-    seq_bytes = b"".join(data)
-    return (reduce(lambda x, y: x + y, seq_bytes) % module).to_bytes(1, byteorder='big')
-
-
-def parse_message(message: bytes):
-    """ This function used to parse data from message. 
-        Fetch data from message and return list of values
-    """
-    data = message[3:-2]
-    values = [int.from_bytes(b, byteorder='big', signed=True) for b in split_seq(data)]
-    return values
-
-
-def split_seq(seq, start=1, stop=3):
-    """ This generator split sequence on part (start:stop) and return generator """
-    while seq:
-        yield seq[start:stop]
-        seq = seq[stop:]
-
-
 def message_pattern(pattern, imax=9.99, *, as_voltage=False):
     """ This function generate pattern and return it as generator
     :param pattern:
@@ -119,65 +84,297 @@ def message_pattern(pattern, imax=9.99, *, as_voltage=False):
     }
     return [kwarg[key] if key != 'L' else key for key in pattern]
 
-class PatternHandler:
-    """ This class represents a hook. 
-    It changes data in the message with specified pattern 
-    and returns a new data.
+class OutputStage:
+    """ This class represents the output stage of the relay.
+    It limits the change of every channel per cycle (slew rate)
+    and decides which channels must be sent to the compensator.
+
+    :param slew: max change of value per cycle (0 - without limit)
+    :param keepalive: period (seconds) to resend unchanged frame
+        (0 - send every cycle)
+    :param delta: send only changed channels instead of full frame
     """
 
-    def __init__(self, pattern, channels):
-        self.channels = channels
-        self.pattern = pattern[:channels]
+    def __init__(self, slew=0, keepalive=0, delta=False, clock=time.monotonic):
+        self.slew = slew
+        self.keepalive = keepalive
+        self.delta = delta
+        self.clock = clock
+
+        self.previous = None
+        self.sent = None
+        self.sent_time = None
+        self.skipped = 0
+
+    def limit(self, data: list) -> list:
+        """ Clamp step of all channels and return new output vector.
+        The output starts from zero currents.
+        """
+        if self.previous is None or len(self.previous) != len(data):
+            self.previous = [0] * len(data)
+        if self.slew:
+            s = self.slew
+            self.previous = [p + (s if v - p > s else -s if p - v > s else v - p)
+                             for p, v in zip(self.previous, data)]
+        else:
+            self.previous = list(data)
+        return self.previous
+
+    def select(self, data: list):
+        """ Return list of channels (numbers from 1) to send,
+        None if all channels must be sent or empty list if frame is skipped
+        """
+        now = self.clock()
+        if (not self.keepalive
+                or self.sent is None
+                or len(self.sent) != len(data)
+                or now - self.sent_time >= self.keepalive):
+            self._store(data, now)
+            return None
+
+        changed = [i for i, (old, new) in enumerate(zip(self.sent, data), 1) if old != new]
+        if not changed:
+            self.skipped += 1
+            return changed
+
+        if self.delta:
+            # Keep-alive time is counted from the last full frame
+            self.sent = list(data)
+            return changed
+
+        self._store(data, now)
+        return None
+
+    def _store(self, data, now):
+        self.sent = list(data)
+        self.sent_time = now
+
+    def invalidate(self):
+        """ Force full frame on the next cycle """
+        self.sent = None
+
+
+class FrameWriter(threading.Thread):
+    """ This class writes encoded frames to the port in the background thread.
+    The mailbox keeps only one frame: if the port is busy, then an unsent
+    frame is replaced by the newer one (latest wins) and counted as superseded.
+
+    :param max_waiting: max bytes in the output buffer of driver
+        before the next frame is written
+    """
 
-    def __call__(self, data):
-        return self._handle(data)
+    def __init__(self, port, max_waiting=0, poll=0.001):
+        super().__init__(daemon=True)
+        self.port = port
+        self.max_waiting = max_waiting
+        self.poll = poll
+
+        self.superseded = 0
+        self.written = 0
+        self.lost = 0
+
+        self._frame = None
+        self._running = True
+        self._cond = threading.Condition()
+
+    def write(self, frame):
+        """ Put frame to the mailbox. Returns False if the previous frame was dropped """
+        with self._cond:
+            dropped = self._frame is not None
+            if dropped:
+                self.superseded += 1
+            self._frame = frame
+            self._cond.notify()
+        return not dropped
+
+    def run(self):
+        while True:
+            with self._cond:
+                while self._frame is None and self._running:
+                    self._cond.wait()
+                if self._frame is None:
+                    return
+
+            # Wait until the driver sends previous frames. The frame is taken
+            # from the mailbox after it, so the newest frame is always written.
+            while self._running and self._out_waiting() > self.max_waiting:
+                time.sleep(self.poll)
+
+            with self._cond:
+                frame, self._frame = self._frame, None
+            try:
+                self.port.write(frame)
+            except PortUnavailable:
+                self.lost += 1
+            except (serial.SerialException, OSError):
+                # The port is closed by close() while the write is blocked
+                if self._running:
+                    raise
+                self.lost += 1
+                return
+            else:
+                self.written += 1
+
+    def _out_waiting(self):
+        try:
+            return self.port.out_waiting
+        except (AttributeError, serial.SerialException):
+            return 0
+
+    def close(self, timeout=1.0):
+        """ Write the pending frame, stop the thread and close the port.
+        If the port is stalled, the port is closed after timeout (seconds)
+        without waiting for the blocked write.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self.is_alive():
+            self.join(timeout)
+        if self.is_alive():
+            logger.warning("Writing to %s is blocked, the port is closed",
+                           getattr(self.port, 'port', self.port))
+        self.port.close()
 
-    def _handle(self, data: list) -> list:
-        value = data[0]
-        data_changed = [value if i == 'L' else i for i in self.pattern]
-        return data_changed
 
+class PortInput(object):
+    """ ADC port. Messages are found by the header of the input protocol
+    and read by its size (see codec.Codec.size), channels is the number
+    of channels of the ADC if the protocol has no count byte.
+    """
 
-class VoltageHandler:
-    """ This handler convert all values in data to current
-    and return list of values"""
-    
-    def __init__(self, imax=9.99, vmax=300, ku=1):
-        self.imax = imax
-        self.vmax = vmax
-        self.ku = ku    
+    def __init__(self, port, *args, decoder=INPUT, channels=6, **kwargs):
+        self.sobj = serial.Serial(port)
+        self.decoder = decoder
+        self.channels = channels
 
-    def __call__(self, data):
-        return self._handler(data)
+    def close(self):
+        self.sobj.close()
 
-    def _handler(self, data):
-        res = []
-        for value in data:
-            res.append(int((self.imax / self.vmax) * self.ku * value * 100))
-        return res
+    def read(self, size=1):
+        header = self.decoder.header
+        received = b""
+        while received != header:
+            received = (received + self.sobj.read(1))[-len(header):]
+        prefix = header + self.sobj.read(self.decoder.prefix_size - len(header))
+        return prefix + self.sobj.read(self.decoder.size(prefix, self.channels) - len(prefix))
 
 
-class PortInput(object):
-    def __init__(self, port, *args, **kwargs):
-        self.sobj = serial.Serial(port)
+class InputSource(threading.Thread):
+    """ This class reads messages from one ADC port in the background thread
+    and keeps the latest valid message with the time of its receiving.
+    """
+
+    def __init__(self, port, cond, clock=time.monotonic, decoder=INPUT):
+        super().__init__(daemon=True)
+        self.port = port
+        self.cond = cond
+        self.clock = clock
+        self.decoder = decoder
+
+        self.message = None
+        self.time = None
+        self.valid = 0
+        self.invalid = 0
+        self.used = 0
+
+        self._running = True
+
+    def run(self):
+        while self._running:
+            try:
+                message = self.port.read()
+            except serial.SerialException:
+                # The port is reconnected by ReconnectingPort
+                time.sleep(0.05)
+                continue
+            if not self.decoder.check(message):
+                self.invalid += 1
+                continue
+            with self.cond:
+                self.message = message
+                self.time = self.clock()
+                self.valid += 1
+                self.cond.notify_all()
+
+    def close(self):
+        self._running = False
+        self.port.close()
+
+
+class MultiInput:
+    """ This class reads ADC messages from several ports concurrently,
+    so compensation does not depend on the single ADC link.
+
+    :param mode: 'freshest' - the latest valid message of any port,
+        'median' - per channel median (vote) of fresh messages of all ports
+        (average for two ports)
+    :param max_age: messages older than max_age (seconds) are not used
+    """
+
+    def __init__(self, ports, mode='freshest', max_age=1.0, clock=time.monotonic, decoder=INPUT):
+        if mode not in ('freshest', 'median'):
+            raise ValueError("Unknown input mode: {}".format(mode))
+        self.mode = mode
+        self.max_age = max_age
+        self.clock = clock
+        self.last = None
+        self.decoder = decoder
+
+        self.cond = threading.Condition()
+        self.sources = [InputSource(port, self.cond, clock, decoder) for port in ports]
+        for source in self.sources:
+            source.start()
 
     def read(self, size=1):
-        ready = False
-        while not ready:
-            header = self.sobj.read(1)
-            if header == b"$":
-                msg = header + self.sobj.read(size=23)
-                ready = True
-        return msg
+        """ Wait for the message newer than previous one at most max_age seconds """
+        deadline = self.clock() + self.max_age
+        with self.cond:
+            while True:
+                now = self.clock()
+                fresh = [s for s in self.sources if s.time is not None and now - s.time <= self.max_age]
+                newest = max(fresh, key=lambda s: s.time, default=None)
+                if newest and (self.last is None or newest.time > self.last):
+                    break
+                if now >= deadline:
+                    raise PortUnavailable("No valid messages from ADC ports")
+                self.cond.wait(deadline - now)
+
+            self.last = newest.time
+            if self.mode == 'median' and len(fresh) > 1:
+                for source in fresh:
+                    source.used += 1
+                data = median([self.decoder.decode(source.message) for source in fresh])
+                return self.decoder.encode(data)
+            newest.used += 1
+            return newest.message
+
+    def stats(self):
+        return [{"port": getattr(s.port, 'port', 'VCOM'), "valid": s.valid,
+                 "invalid": s.invalid, "used": s.used} for s in self.sources]
+
+    def close(self):
+        for source in self.sources:
+            source.close()
+
+
+def median(vectors):
+    """ Return per channel median of vectors """
+    from statistics import median
+
+    return [int(median(values)) for values in zip(*vectors)]
 
 
 class VirtualPort(serial.Serial):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, period=0, **kwargs):
         super(VirtualPort, self).__init__()
         input_data = [300, 0, 0, 0, 0, 0]
-        self.message = create_message(input_data, protocol=protocols['input'])
+        self.message = INPUT.encode(input_data)
+        self.period = period
 
     def read(self, size=1):
+        if self.period:
+            time.sleep(self.period)
         return self.message
 
     def write(self, message):
@@ -186,51 +383,306 @@ class VirtualPort(serial.Serial):
         print("send: {0}, {1}\n".format(length, msg))
 
 
-def redirect(reader, writter, handlers, dbytes=False):
-    """ This function read message from reader and redirect it to writter."""
+def redirect(reader, writter, handlers, encoder, stage=None, decoder=INPUT):
+    """ This function read message from reader and redirect it to writter.
+    The handlers are the chain (see handlers) or the list of callables.
+    Messages are decoded and encoded by codecs (see codec).
+    If the output stage skips the frame, then None is returned.
+    """
+    start = clock()
     message = reader.read()
-    data = parse_message(message)
+    start = TIMERS.mark('relay.read', start)
+    data = decoder.decode(message)
     QUEUE_INPUT.append(data)
+    start = TIMERS.mark('relay.parse', start)
 
-    if handlers:
+    if callable(handlers):
+        data = handlers(data)
+    elif handlers:
         for handler in handlers:
             data = handler(data)
+    TIMERS.mark('relay.handle', start)
+
+    return send(data, writter, encoder, stage=stage)
+
+
+def send(data, writter, encoder, stage=None):
+    """ This function send data to writter through the output stage """
+    start = clock()
+    channels = None
+    if stage:
+        data = stage.limit(data)
+        channels = stage.select(data)
 
     QUEUE.append(data)
+    start = TIMERS.mark('relay.output', start)
 
-    if dbytes:
-        protocol_name = 'amk'
-    else:
-        protocol_name = 'cm'
+    if channels is not None and not channels:
+        return None
 
-    message = create_message(data, protocol=protocols['output'][protocol_name])
+    message = encoder.encode(data, channels=channels)
+    start = TIMERS.mark('relay.encode', start)
 
     writter.write(message)
+    TIMERS.mark('relay.write', start)
 
     return message
 
 
+class Relay:
+    """ This class keeps ports, handlers and output stage between cycles.
+    The reader and the output port are opened by settings if not specified.
+    """
+
+    def __init__(self, settings, reader=None, port=None):
+        self.settings = dict(settings)
+        self.pattern = None
+        self.sequencer = None
+
+        self.encoder = codec.Codec(codec.output_layout(settings), imax=int(settings['imax']))
+        self.decoder = codec.Codec(codec.input_layout(settings))
+        self.reader = reader or open_inputs(settings, self.decoder)
+        self.writter = FrameWriter(port or open_output(settings['port_output']))
+        self.writter.start()
+
+        self.frames = 0
+        self.held = 0
+        self.inputs = []
+        self.stage = OutputStage(
+            slew=int(settings.get('slew_rate', 0) * 100),
+            keepalive=settings.get('keepalive', 0) / 1000,
+            delta=settings.get('delta', False)
+        )
+        self.handlers = build_chain(settings.get('handlers'), settings)
+        self.publisher = None
+        if settings.get('broadcast'):
+            from broadcast import FramePublisher
+
+            self.publisher = FramePublisher.from_settings(settings['broadcast'])
+        # The number of inputs is known with the first message of the ADC
+        self.recorder = None
+        self.input_alarms = self.output_alarms = None
+        if settings.get('alarms'):
+            import alarms
+
+            self.input_alarms = alarms.from_settings('input', settings['alarms'])
+            self.output_alarms = alarms.from_settings('output', settings['alarms'])
+
+        options = settings.get('statistics') or {}
+        self.channel_stats = {
+            "input": RunningStats(window=options.get('window', 0)),
+            "output": RunningStats(window=options.get('window', 0))
+        }
+        if options.get('alpha'):
+            self.channel_stats["input_decay"] = DecayingStats(alpha=options['alpha'])
+            self.channel_stats["output_decay"] = DecayingStats(alpha=options['alpha'])
+
+    def set_pattern(self, pattern):
+        if pattern == self.pattern:
+            return
+        self.pattern = list(pattern)
+        if self.sequencer and not self.sequencer.finished:
+            return
+        self._apply_pattern()
+
+    def _apply_pattern(self):
+        """ Switch to the pattern of the operator """
+        if self.pattern is None:
+            return
+        values = message_pattern(self.pattern, imax=(self.settings['imax'] - 0.01))
+        self.handlers.set_pattern(PatternHandler(pattern=values, channels=self.settings['channels']))
+
+    def set_sequence(self, sequencer):
+        """ Run the sequence of patterns (see sequencer). None cancels it.
+        The pattern of the operator is restored when the sequence is finished.
+        """
+        self.sequencer = sequencer
+        if sequencer is None:
+            self._apply_pattern()
+
+    @property
+    def outputs(self):
+        return self.stage.previous or []
+
+    def step(self):
+        superseded = self.writter.superseded
+        reconnects = getattr(self.writter.port, 'reconnects', 0)
+        if self.sequencer and not self.sequencer.finished:
+            handler = self.sequencer.next()
+            if handler:
+                self.handlers.set_pattern(handler)
+            elif self.sequencer.finished:
+                self._apply_pattern()
+        try:
+            message = redirect(self.reader, self.writter, self.handlers, self.encoder,
+                               stage=self.stage, decoder=self.decoder)
+            self.inputs = QUEUE_INPUT[-1]
+            if self.input_alarms:
+                self.log_alarms(self.input_alarms.update(self.inputs))
+            self.update_statistics('input', self.inputs)
+        except PortUnavailable:
+            message = self.hold()
+        if self.output_alarms:
+            self.log_alarms(self.output_alarms.update(self.outputs))
+        self.update_statistics('output', self.outputs)
+        if (self.stage.delta and self.writter.superseded != superseded
+                or getattr(self.writter.port, 'reconnects', 0) != reconnects):
+            # Changes of the dropped frame are lost or the compensator
+            # was disconnected, so send full frame next time
+            self.stage.invalidate()
+        self.frames += 1
+        if self.publisher:
+            self.publisher.publish(self.frames, self.inputs, self.outputs)
+        if self.recorder:
+            self.recorder.write(self.frames, self.inputs, self.outputs)
+        elif self.inputs and self.settings.get('record'):
+            from recorder import Recorder
+
+            self.recorder = Recorder.create(self.settings['record'], len(self.inputs),
+                                            self.settings['channels'])
+            self.recorder.write(self.frames, self.inputs, self.outputs)
+        return message
+
+    def update_statistics(self, name, values):
+        self.channel_stats[name].update(values)
+        decay = self.channel_stats.get(name + "_decay")
+        if decay:
+            decay.update(values)
+
+    def statistics(self):
+        """ Return running statistics of input voltages and output currents """
+        return {name: stats.result() for name, stats in self.channel_stats.items()}
+
+    def reset_statistics(self):
+        for stats in self.channel_stats.values():
+            stats.reset()
+
+    def log_alarms(self, events):
+        for name, channel, kind, raised, value in events:
+            if raised:
+                logger.warning("Alarm %s %d: %s, value %d", name, channel, kind, value)
+            else:
+                logger.info("Alarm %s %d: %s is cleared, value %d", name, channel, kind, value)
+
+    def hold(self):
+        """ Send the last good output (or Null pattern) while ADC is disconnected """
+        self.held += 1
+        if self.settings.get('hold', 'last') == 'null' or not self.outputs:
+            data = [0] * self.settings['channels']
+        else:
+            data = self.outputs
+        return send(data, self.writter, self.encoder, stage=self.stage)
+
+    def serve_forever(self, interval, running, callback=None):
+        """ Run cycles with fixed interval (seconds) while running() returns True.
+        The callback is invoked after every cycle with the relay.
+        If the cycle overruns the interval, then the next one is started
+        at once without burst of delayed cycles.
+        """
+        deadline = time.monotonic()
+        while running():
+            self.step()
+            if callback:
+                callback(self)
+            deadline += interval
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.monotonic()
+
+    def stats(self):
+        ports = [self.writter.port, self.reader]
+        if isinstance(self.reader, MultiInput):
+            ports = [self.writter.port] + [source.port for source in self.reader.sources]
+        ports = [port for port in ports if isinstance(port, ReconnectingPort)]
+        return {
+            "frames": self.frames,
+            "skipped": self.stage.skipped,
+            "written": self.writter.written,
+            "superseded": self.writter.superseded,
+            "lost": self.writter.lost,
+            "held": self.held,
+            "outages": sum(port.outages for port in ports),
+            "outage_time": sum(port.outage_time for port in ports),
+            "outage": max((port.outage() for port in ports), default=0.0),
+            "sources": self.reader.stats() if isinstance(self.reader, MultiInput) else [],
+            "step": self.sequencer.progress()['step'] if self.sequencer else 0,
+            "steps": self.sequencer.progress()['steps'] if self.sequencer else 0,
+            "alarms": {
+                "input": self.input_alarms.alarms() if self.input_alarms else [],
+                "output": self.output_alarms.alarms() if self.output_alarms else []
+            },
+            "viewers_dropped": self.publisher.dropped if self.publisher else 0
+        }
+
+    def close(self):
+        self.reader.close()
+        self.writter.close()
+        if self.publisher:
+            self.publisher.close()
+        if self.recorder:
+            self.recorder.close()
+
+
+def open_input(port, period=0, decoder=INPUT, channels=6):
+    if port == 'VCOM':
+        return VirtualPort(period=period)
+    return ReconnectingPort(port, opener=partial(PortInput, decoder=decoder, channels=channels))
+
+
+def open_inputs(settings, decoder=INPUT):
+    """ Open the ADC port or the redundant ADC ports if backup ports are specified """
+    backup = settings.get('port_input_backup') or []
+    if isinstance(backup, str):
+        backup = [backup]
+    ports = [settings['port_input']] + [port for port in backup if port and port != settings['port_input']]
+    channels = settings.get('input_channels', 6)
+    if len(ports) == 1:
+        return open_input(ports[0], decoder=decoder, channels=channels)
+
+    return MultiInput(
+        [open_input(port, period=0.01, decoder=decoder, channels=channels) for port in ports],
+        mode=settings.get('input_mode', 'freshest'),
+        max_age=settings.get('input_max_age', settings.get('interval', 1000)) / 1000,
+        decoder=decoder
+    )
+
+
+def open_output(port):
+    if port == 'VCOM':
+        return VirtualPort()
+    return ReconnectingPort(port, opener=serial.Serial)
+
+
+RELAY = None
+
+
 def run(pattern, settings):
-    pattern = message_pattern(pattern, imax=(settings['imax'] - 0.01))
+    """ Run one cycle of relay. Ports are reopened only if settings are changed """
+    global RELAY
 
-    handlers = []
-    handlers.append(VoltageHandler(imax=settings['imax']))
-    handlers.append(PatternHandler(pattern=pattern, channels=settings['channels']))
+    if RELAY is None or RELAY.settings != settings:
+        stop()
+        RELAY = Relay(settings)
 
-    pin = settings['port_input']
-    pout = settings['port_output']
+    RELAY.set_pattern(pattern)
+    return RELAY.step()
 
-    if pin == 'VCOM':
-        reader = VirtualPort()
-    else:
-        reader = PortInput(port=pin)
 
-    if pout == 'VCOM':
-        writter = VirtualPort()
-    else:
-        writter = serial.Serial(port=pout)
+def stats():
+    """ Return counters of the running relay """
+    if RELAY is None:
+        return {}
+    return RELAY.stats()
+
+
+def stop():
+    global RELAY
 
-    redirect(reader, writter, handlers, dbytes=settings['channels_byte'])
+    if RELAY is not None:
+        RELAY.close()
+        RELAY = None
 
 
 def main():
@@ -241,7 +693,7 @@ def main():
     try:
         while True:
             msg = sobj.read()
-            data = parse_message(msg)
+            data = INPUT.decode(msg)
 
             if handlers:
                 for handler in handlers:
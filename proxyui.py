@@ -1,15 +1,33 @@
+import time
+
+# Time of start is used by the startup benchmark (see bench_startup.py)
+STARTED = time.perf_counter()
+
+import argparse
 import json
+import multiprocessing
 import os.path
 import sys
+import threading
 import logging
 
 from PyQt5 import QtCore
-from PyQt5.QtGui import *
-from PyQt5.QtWidgets import *
+from PyQt5.QtGui import QIcon, QPixmap
+from PyQt5.QtWidgets import (
+    QAction, QApplication, QCheckBox, QComboBox, QFileDialog, QGridLayout, QGroupBox,
+    QHBoxLayout, QLabel, QMainWindow, QPushButton, QSizePolicy, QSpacerItem, QVBoxLayout, QWidget
+)
 
 from panel import PanelManager
 
+import codec
+import profiling
 import proxy
+import runstats
+from sequencer import Sequencer
+
+# relayd and relayproc (sockets, shared memory) are imported on demand
+# to keep the cold start short
 
 __title__ = "Мониторинг последовательного канала КЭД КФ1/1М"
 __version__ = "1.0.1"
@@ -24,10 +42,39 @@ config = {
         "channels": ("43", "48", "121", "150"),
         "currents": ("10", "55"),
         "interval": ("1000",)
+    },
+    "relay": {
+        "slew_rate": 0,
+        "keepalive": 0,
+        "delta": False,
+        "handlers": [
+            {"name": "voltage"},
+            {"name": "pattern"}
+        ],
+        "process": False,
+        "record": "",
+        "protocols": codec.PROTOCOLS,
+        "input_channels": 6,
+        "address": "",
+        "broadcast": {
+            "udp": "",
+            "tcp": ""
+        },
+        "statistics": {
+            "window": 0,
+            "alpha": 0.01
+        },
+        "alarms": {
+            "hysteresis": 2,
+            "input": {"min": -300, "max": 300, "rate": None, "stuck": None},
+            "output": {"min": None, "max": None, "rate": None, "stuck": None}
+        }
     }
 }
 
 class Ui(QMainWindow):
+    portsFound = QtCore.pyqtSignal(list)
+
     def __init__(self):
         super().__init__()
 
@@ -57,6 +104,27 @@ class Ui(QMainWindow):
         file_menu = menubar.addMenu('&Файл')
         file_menu.addAction(self.sysconf_action)
 
+        self.process_action = QAction('&Отдельный процесс обмена', self, checkable=True)
+        self.process_action.setChecked(config.get('relay', {}).get('process', False))
+        file_menu.addAction(self.process_action)
+
+        self.attach_action = QAction('&Подключиться к службе обмена', self, checkable=True)
+        file_menu.addAction(self.attach_action)
+
+        self.sequence_action = QAction('&Запустить программу испытаний...', self)
+        file_menu.addAction(self.sequence_action)
+
+        self.export_stats_action = QAction('&Экспорт статистики...', self)
+        file_menu.addAction(self.export_stats_action)
+        self.reset_stats_action = QAction('&Сбросить статистику', self)
+        file_menu.addAction(self.reset_stats_action)
+
+        self.timers_action = QAction('&Профилирование', self, checkable=True)
+        self.timers_action.setChecked(profiling.TIMERS.enabled)
+        file_menu.addAction(self.timers_action)
+        self.profile_action = QAction('Снять &профиль (30 с)', self)
+        file_menu.addAction(self.profile_action)
+
         self.createStatusbar()
 
         self.portbox = self.createPortbox()
@@ -113,6 +181,10 @@ class Ui(QMainWindow):
         port_input = QComboBox()
         port_input.setObjectName("port_input")
 
+        # Backup input port (redundant ADC)
+        port_input_backup = QComboBox()
+        port_input_backup.setObjectName("port_input_backup")
+
         # Output port
         port_output = QComboBox()
         port_output.setObjectName("port_output")
@@ -122,30 +194,45 @@ class Ui(QMainWindow):
 
         layout.addWidget(QLabel('Порт АЦП:'), 0, 0)
         layout.addWidget(port_input, 0, 1)
-        layout.addWidget(QLabel("Порт КЭД:"), 1, 0)
-        layout.addWidget(port_output, 1, 1)
+        layout.addWidget(QLabel('Резерв АЦП:'), 1, 0)
+        layout.addWidget(port_input_backup, 1, 1)
+        layout.addWidget(QLabel("Порт КЭД:"), 2, 0)
+        layout.addWidget(port_output, 2, 1)
         layout.addWidget(btnRescan, 3, 1)
 
         # Slots
         def _on_change_port():
             self.ports_config = {
                 "port_input": wgt.findChild(QComboBox, "port_input").currentText(),
+                "port_input_backup": port_input_backup.currentData() or "",
                 "port_output": wgt.findChild(QComboBox, "port_output").currentText()
             }
 
         def _on_find_ports():
-            port_input.clear()
-            port_output.clear()
+            """ Find ports in the background thread, the window is not blocked """
+            btnRescan.setDisabled(True)
+            for combo in (port_input, port_input_backup, port_output):
+                combo.clear()
+                combo.setDisabled(True)
+            self.statusBar().showMessage("Поиск портов...")
+
+            threading.Thread(target=lambda: self.portsFound.emit(proxy.scan()), daemon=True).start()
 
+        def _on_ports_found(ports):
+            btnRescan.setEnabled(True)
+            self.statusBar().clearMessage()
 
-            ports = proxy.scan()
             ports.append('VCOM')
 
             # TODO: Uncomment when you test with ADC
             port_input.addItems(ports)
             #port_input.addItem('VCOM')
             port_output.addItems(ports)
+            port_input_backup.addItem('—', "")
+            for port in ports:
+                port_input_backup.addItem(port, port)
 
+            port_input_backup.setEnabled(True)
             if len(ports) > 1:
                 port_input.setEnabled(True)
                 port_input.setCurrentIndex(0)
@@ -157,8 +244,10 @@ class Ui(QMainWindow):
 
         # Connect signal/slot
         port_input.currentTextChanged['QString'].connect(_on_change_port)
+        port_input_backup.currentTextChanged['QString'].connect(_on_change_port)
         port_output.currentTextChanged['QString'].connect(_on_change_port)
         btnRescan.clicked.connect(_on_find_ports)
+        self.portsFound.connect(_on_ports_found)
 
         _on_find_ports()
         _on_change_port()
@@ -233,6 +322,7 @@ class Ui(QMainWindow):
     def _lock(self, is_lock):
         self.portbox.setDisabled(is_lock)
         self.degausbox.setDisabled(is_lock)
+        self.process_action.setDisabled(is_lock)
         self.buttons['start'].setDisabled(is_lock)
         self.buttons['stop'].setEnabled(is_lock)
 
@@ -266,6 +356,10 @@ class ProxyApp(Ui):
         super(ProxyApp, self).__init__()
 
         self.timer_id = None
+        self.worker = None
+        self.client = None
+        self.ticks = 0
+        self.profiler = None
 
         # Connect signal/slot
         self.buttons['start'].clicked.connect(self.on_start)
@@ -274,6 +368,12 @@ class ProxyApp(Ui):
         self.protocol_group['channels'].currentTextChanged['QString'].connect(self.on_change_channels)
 
         self.sysconf_action.triggered.connect(self._create_sysconf)
+        self.attach_action.triggered['bool'].connect(self.on_attach)
+        self.sequence_action.triggered.connect(self.on_sequence)
+        self.export_stats_action.triggered.connect(self.on_export_statistics)
+        self.reset_stats_action.triggered.connect(self.on_reset_statistics)
+        self.timers_action.triggered['bool'].connect(self.on_timers)
+        self.profile_action.triggered.connect(self.on_profile)
 
     def _create_sysconf(self):
         full_path = os.path.join(PATH, "sysconf.json")
@@ -284,13 +384,19 @@ class ProxyApp(Ui):
     def closeEvent(self, event):
         self.on_quit()
 
+    def _lock(self, is_lock):
+        super()._lock(is_lock)
+        self.process_action.setDisabled(is_lock or self.client is not None)
+        self.attach_action.setDisabled(is_lock and self.client is None)
+
     def timerEvent(self, event):
         self.on_run()
 
     def get_settings(self):
-        config = dict(self.degaus_config)
-        config.update(self.ports_config)
-        return config
+        settings = dict(config.get('relay', {}))
+        settings.update(self.degaus_config)
+        settings.update(self.ports_config)
+        return settings
 
     def get_pattern(self):
         return list(self.panel.fetch_pattern())
@@ -299,23 +405,74 @@ class ProxyApp(Ui):
         nChannels = int(text)
         self.panel.resize(nChannels)
 
+    @profiling.timed('gui.on_run')
     def on_run(self):
         """ """
         # Its Debug code
         time = QtCore.QTime()
 
+        self.ticks += 1
+
+        if self.profiler and not self.profiler.is_alive():
+            # The frame is shown over the message, so the path is logged as well
+            logging.info("Profile is saved to %s", self.profiler.path)
+            self.statusBar().showMessage(f"Профиль сохранен в {self.profiler.path}", 5000)
+            self.profiler = None
+
+        if self.worker and self.worker is not self.client and not self.worker.is_alive():
+            code = self.worker.process.exitcode
+            self.on_stop()
+            self.statusBar().showMessage(f"Служба обмена остановлена с ошибкой (код {code})")
+            return
+
+        if self.worker:
+            snapshot = self.worker.snapshot()
+            if snapshot:
+                self.show_frame(snapshot.outputs, snapshot.inputs, snapshot.stats, snapshot.alarms)
+            else:
+                self.show_frame(None)
+            self.worker.set_pattern(self.get_pattern())
+            # Statistics is requested from the relay, so it is updated rarely
+            if self.ticks % 10 == 0:
+                self.panel.view_statistics(self.poll_statistics().get('output'))
+            return
+
+        # Statistics of all channels is copied and the panel is redrawn with
+        # new tooltips, so it is refreshed as rarely as in the worker mode
+        if self.ticks % 10 == 0:
+            self.panel.view_statistics(self.get_statistics().get('output'))
+
         if proxy.QUEUE:
-            data = proxy.QUEUE.popleft()
-            self.panel.view_show(data)
-            input_str = "Voltage: " + ",".join([str(i) for i in proxy.QUEUE_INPUT.popleft()])
-            self.statusBar().showMessage(input_str)
+            inputs = proxy.QUEUE_INPUT.popleft() if proxy.QUEUE_INPUT else []
+            stats = proxy.stats()
+            self.show_frame(proxy.QUEUE.popleft(), inputs, stats, stats['alarms']['output'])
         else:
-            self.statusBar().showMessage('Отсутствует сообщение')
+            self.show_frame(None)
 
         config = self.get_settings()
         pattern = self.get_pattern()
         proxy.run(pattern, config)
 
+    def show_frame(self, outputs, inputs=None, stats=None, alarms=None):
+        if outputs is None:
+            self.statusBar().showMessage('Отсутствует сообщение')
+            return
+
+        self.panel.view_show(outputs, alarms)
+        input_str = "Voltage: " + ",".join([str(i) for i in inputs])
+        superseded = stats.get('superseded')
+        if superseded:
+            input_str += " (сброшено кадров: {})".format(superseded)
+        outage = stats.get('outage')
+        if outage:
+            input_str += " (нет связи с портом {:.1f} с)".format(outage)
+        input_alarms = stats.get('alarms', {}).get('input')
+        if input_alarms:
+            input_str += " (авария АЦП: {})".format(",".join(str(i) for i in input_alarms))
+        if stats.get('steps'):
+            input_str += " (программа: шаг {}/{})".format(stats['step'], stats['steps'])
+        self.statusBar().showMessage(input_str)
+
     def on_start(self):
         # if config['port_input'] == config['port_output']:
         #     self.statusBar().showMessage("Необходимо выбрать разные порты!", 2000)
@@ -326,7 +483,25 @@ class ProxyApp(Ui):
 
         settings = self.get_settings()
         pattern = self.get_pattern()
-        proxy.run(pattern, settings)
+        if not self.client and not (settings['port_input'] and settings['port_output']):
+            self._lock(False)
+            self.statusBar().showMessage("Порты не выбраны", 2000)
+            return
+
+        if self.client:
+            try:
+                self.client.start(pattern, settings)
+            except (OSError, RuntimeError) as e:
+                self._lock(False)
+                self.statusBar().showMessage(f"Ошибка службы обмена: {e}", 2000)
+                return
+            self.worker = self.client
+        elif self.process_action.isChecked():
+            from relayproc import RelayProcess
+            self.worker = RelayProcess()
+            self.worker.start(pattern, settings)
+        else:
+            proxy.run(pattern, settings)
 
         self.pix.setText('Обмен')
 
@@ -338,17 +513,174 @@ class ProxyApp(Ui):
         if self.timer_id:
             self.killTimer(self.timer_id)
             self.timer_id = 0
+        self.stop_relay()
 
         self.panel.view_clear()
         self.pix.setText('idle')
         self.statusBar().showMessage("Отключено", 2000)
 
+    def poll_statistics(self):
+        """ Return the latest statistics without waiting for the relay """
+        try:
+            return self.worker.poll_statistics()
+        except (OSError, RuntimeError):
+            return {}
+
+    def get_statistics(self):
+        if self.worker:
+            try:
+                return self.worker.statistics()
+            except (OSError, RuntimeError):
+                return {}
+        if proxy.RELAY:
+            return proxy.RELAY.statistics()
+        return {}
+
+    def on_export_statistics(self):
+        results = self.get_statistics()
+        if not results:
+            self.statusBar().showMessage("Статистика доступна во время обмена", 2000)
+            return
+
+        path, _ = QFileDialog.getSaveFileName(self, "Экспорт статистики", PATH, "CSV (*.csv)")
+        if not path:
+            return
+        try:
+            runstats.write_csv(path, results)
+        except OSError as e:
+            self.statusBar().showMessage(f"Ошибка экспорта: {e}", 2000)
+            return
+        self.statusBar().showMessage(f"Статистика сохранена в {path}", 2000)
+
+    def on_reset_statistics(self):
+        if self.worker:
+            self.worker.reset_statistics()
+        elif proxy.RELAY:
+            proxy.RELAY.reset_statistics()
+
+    def on_timers(self, enabled):
+        """ Switch stage timers. The report is written when timers are switched off """
+        paths = [profiling.control(enabled=enabled)]
+        if self.worker:
+            paths.append(self.worker.profile(enabled=enabled))
+        paths = [path for path in paths if path]
+        if paths:
+            self.statusBar().showMessage("Отчет профилирования сохранен в {}".format(", ".join(paths)), 5000)
+
+    def on_profile(self, seconds=30):
+        """ Capture sampling profile of the application (or relay) for N seconds """
+        if self.worker:
+            path = self.worker.profile(seconds=seconds)
+            if path:
+                self.statusBar().showMessage(f"Профиль службы обмена будет сохранен в {path}", 5000)
+            else:
+                self.statusBar().showMessage("Служба обмена не ответила", 2000)
+            return
+        if self.profiler:
+            return
+        self.profiler = profiling.SamplingProfiler(seconds)
+        self.profiler.start()
+        self.statusBar().showMessage(f"Профилирование {seconds} с...", 2000)
+
+    def on_sequence(self):
+        """ Load the script of test procedure and run it on the relay """
+        if not self.timer_id:
+            self.statusBar().showMessage("Программа запускается во время обмена", 2000)
+            return
+
+        path, _ = QFileDialog.getOpenFileName(self, "Программа испытаний", PATH, "JSON (*.json)")
+        if not path:
+            return
+
+        try:
+            sequencer = Sequencer.load(path, self.get_settings())
+            if self.worker:
+                # The relay compiles the script itself, it is checked here
+                self.worker.set_sequence(sequencer.script)
+            else:
+                proxy.RELAY.set_sequence(sequencer)
+        except (OSError, KeyError, ValueError, RuntimeError) as e:
+            self.statusBar().showMessage(f"Ошибка программы испытаний: {e}", 2000)
+            return
+        logging.info("Sequence %s is started", path)
+
+    def on_attach(self, attach):
+        """ Attach to the relay daemon or detach from it. The relay is not stopped """
+        if not attach:
+            self.detach()
+            return
+
+        import relayd
+
+        try:
+            self.client = relayd.RelayClient(relayd.parse_address(config.get('relay', {}).get('address')))
+            self.client.subscribe()
+            status = self.client.status()
+        except (OSError, RuntimeError) as e:
+            if self.client:
+                self.client.close()
+                self.client = None
+            self.attach_action.setChecked(False)
+            self.statusBar().showMessage(f"Служба обмена недоступна: {e}", 2000)
+            return
+
+        self._lock(False)
+        if status['running']:
+            # Show the running relay as is, so the next cycle does not
+            # replace its pattern with the pattern of the panel
+            self.load_settings(status['settings'])
+            self.panel.set_pattern(status['pattern'])
+            self.worker = self.client
+            self.client.pattern = status['pattern']
+            self.panel.show_panelview()
+            self._lock(True)
+            self.pix.setText('Обмен')
+            self.timer_id = self.startTimer(status['settings']['interval'], timerType=QtCore.Qt.PreciseTimer)
+        self.statusBar().showMessage("Подключено к службе обмена", 2000)
+
+    def load_settings(self, settings):
+        """ Show settings of the message (e.g. of the running relay) in the widgets """
+        for key in ('header', 'channels', 'imax', 'interval'):
+            if key not in settings:
+                continue
+            combo = self.protocol_group[key]
+            text = str(settings[key])
+            if combo.findText(text) < 0:
+                combo.addItem(text)
+            combo.setCurrentText(text)
+        for key in ('channels_byte', 'imax_byte'):
+            if key in settings:
+                self.protocol_group[key].setChecked(bool(settings[key]))
+
+    def detach(self):
+        if self.timer_id:
+            self.killTimer(self.timer_id)
+            self.timer_id = 0
+        if self.worker is self.client:
+            self.worker = None
+        if self.client:
+            self.client.close()
+            self.client = None
+
+        self._lock(False)
+        self.attach_action.setChecked(False)
+        self.panel.view_clear()
+        self.pix.setText('idle')
+
     def on_quit(self):
         if self.timer_id:
             self.killTimer(self.timer_id)
             self.timer_id = 0
+        self.detach()
+        self.stop_relay()
         QtCore.QCoreApplication.exit(0)
 
+    def stop_relay(self):
+        if self.worker:
+            self.worker.stop()
+            self.worker = None
+        proxy.stop()
+
 
 def load_config():
     global config
@@ -365,7 +697,24 @@ def load_config():
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    # Required by the relay process in the frozen (PyInstaller) application
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profile', action='store_true', help="switch on stage timers")
+    parser.add_argument('--profile-capture', type=int, metavar='SECONDS',
+                        help="capture sampling profile after start")
+    # The windowed (-w) build has no stdout, so the benchmark passes the file
+    parser.add_argument('--benchmark-startup', nargs='?', const='', metavar='FILE',
+                        help="print (or write to FILE) time to show the window and quit")
+    # Next to the executable in the frozen application (see profiling.report_path)
+    parser.add_argument('--log', default=profiling.report_path("proxyui.log"), metavar='FILE',
+                        help="log file")
+    args, qt_args = parser.parse_known_args()
+    if args.profile:
+        profiling.TIMERS.enabled = True
+
+    app = QApplication(sys.argv[:1] + qt_args)
 
     # Add icon in the taskbar (only windows))
     if sys.platform == 'win32':
@@ -375,7 +724,25 @@ if __name__ == '__main__':
         ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
         app.setWindowIcon(QIcon(':/rc/Interdit.ico'))
 
+    logging.basicConfig(filename=args.log, level=logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
     load_config()
 
     pui = ProxyApp()
+    if args.profile_capture:
+        pui.on_profile(args.profile_capture)
+
+    if args.benchmark_startup is not None:
+        def _report_startup():
+            report = "startup: {:.1f} ms".format((time.perf_counter() - STARTED) * 1000)
+            if args.benchmark_startup:
+                with open(args.benchmark_startup, 'w') as f:
+                    f.write(report + "\n")
+            else:
+                print(report, flush=True)
+            pui.on_quit()
+        # Invoked by the first iteration of the event loop, after the window is shown
+        QtCore.QTimer.singleShot(0, _report_startup)
+
     sys.exit(app.exec_())
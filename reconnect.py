@@ -0,0 +1,159 @@
+""" Automatic reconnection of USB-serial adapters.
+
+    If the adapter is reset, then the port is closed and reopened
+    with bounded exponential backoff. The device is found again by its
+    USB serial number (or /dev/serial/by-id path, or USB location),
+    because the adapter can get another name (/dev/ttyUSBn, COMn) after reset.
+"""
+
+import glob
+import logging
+import os
+import time
+
+import serial
+
+logger = logging.getLogger(__name__)
+
+
+class PortUnavailable(serial.SerialException):
+    """ The port is disconnected and is not reopened yet """
+
+
+def device_identity(port):
+    """ Return identity of the USB device to find it after reset """
+    from serial.tools import list_ports
+
+    identity = {"device": port}
+    for info in list_ports.comports():
+        if info.device == port:
+            identity.update(serial_number=info.serial_number, vid=info.vid,
+                            pid=info.pid, location=info.location)
+            break
+
+    for path in glob.glob('/dev/serial/by-id/*'):
+        if os.path.realpath(path) == os.path.realpath(port):
+            identity['by_id'] = path
+            break
+    return identity
+
+
+def find_device(identity):
+    """ Return the current name of the device by its identity """
+    by_id = identity.get('by_id')
+    if by_id and os.path.exists(by_id):
+        return os.path.realpath(by_id)
+
+    from serial.tools import list_ports
+
+    ports = list_ports.comports()
+    product = (identity.get('vid'), identity.get('pid'))
+    for key in ('serial_number', 'location'):
+        value = identity.get(key)
+        if not value:
+            continue
+        for info in ports:
+            if getattr(info, key) == value and (info.vid, info.pid) == product:
+                return info.device
+    return identity['device']
+
+
+class ReconnectingPort:
+    """ This class wraps the port and reopens it on failure.
+    While the port is not available, read/write raise PortUnavailable
+    immediately, so the relay can continue its cycles.
+
+    :param opener: callable(device) which opens the port
+    :param backoff: initial delay between attempts (seconds)
+    :param max_backoff: max delay between attempts (seconds)
+    """
+
+    def __init__(self, port, opener, backoff=0.1, max_backoff=5.0, clock=time.monotonic):
+        self.port = port
+        self.opener = opener
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+
+        self.identity = device_identity(port)
+        self.sobj = opener(port)
+        self.closed = False
+
+        self.delay = backoff
+        self.retry_at = 0
+        self.down_since = None
+
+        self.outages = 0
+        self.reconnects = 0
+        self.outage_time = 0.0
+        self.last_outage = 0.0
+
+    @property
+    def available(self):
+        return self.sobj is not None
+
+    def outage(self):
+        """ Duration of the current outage (seconds) """
+        if self.down_since is None:
+            return 0.0
+        return self.clock() - self.down_since
+
+    def read(self, *args, **kwargs):
+        return self._call('read', *args, **kwargs)
+
+    def write(self, *args, **kwargs):
+        return self._call('write', *args, **kwargs)
+
+    @property
+    def out_waiting(self):
+        if self.sobj is None:
+            return 0
+        return self.sobj.out_waiting
+
+    def _call(self, method, *args, **kwargs):
+        if self.sobj is None:
+            self._reconnect()
+        try:
+            return getattr(self.sobj, method)(*args, **kwargs)
+        except (serial.SerialException, OSError) as e:
+            self._lost(e)
+            raise PortUnavailable("Port {} is disconnected".format(self.port)) from e
+
+    def _lost(self, error):
+        logger.warning("Port %s is lost: %s", self.port, error)
+        self._close()
+        self.outages += 1
+        self.down_since = self.clock()
+        self.delay = self.backoff
+        self.retry_at = self.down_since
+
+    def _reconnect(self):
+        now = self.clock()
+        if self.closed or now < self.retry_at:
+            raise PortUnavailable("Port {} is disconnected".format(self.port))
+
+        device = find_device(self.identity)
+        try:
+            self.sobj = self.opener(device)
+        except (serial.SerialException, OSError):
+            self.retry_at = now + self.delay
+            self.delay = min(self.delay * 2, self.max_backoff)
+            raise PortUnavailable("Port {} is disconnected".format(self.port))
+
+        self.last_outage = now - self.down_since
+        self.outage_time += self.last_outage
+        self.down_since = None
+        self.reconnects += 1
+        logger.warning("Port %s is reconnected as %s after %.3f s", self.port, device, self.last_outage)
+
+    def _close(self):
+        if self.sobj is not None:
+            try:
+                self.sobj.close()
+            except (serial.SerialException, OSError):
+                pass
+            self.sobj = None
+
+    def close(self):
+        self.closed = True
+        self._close()
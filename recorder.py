@@ -0,0 +1,178 @@
+""" Recording of relay frames to the binary capture file.
+
+    All records of the file have the same size, so the capture can be
+    read in chunks and searched by time without index.
+
+    Format (little endian, values are int16):
+    Header (32 bytes):
+    | Magic "DGRC" | Version (1 byte) | Reserved (3 bytes) | Number inputs (2 bytes) |
+    | Number outputs (2 bytes) | Start time (8 bytes, double) | Reserved (12 bytes) |
+    Record:
+    | Time (8 bytes, double) | Seq (4 bytes) | Inputs (2 bytes * N) | Outputs (2 bytes * M) |
+
+    The incomplete last record (e.g. after power failure) is ignored.
+"""
+
+from collections import namedtuple
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b"DGRC"
+VERSION = 1
+
+HEADER = struct.Struct("<4sB3xHHd12x")
+RECORD = struct.Struct("<dI")
+
+Chunk = namedtuple("Chunk", "first data")
+
+
+def record_struct(inputs, outputs):
+    return struct.Struct("<dI{}h".format(inputs + outputs))
+
+
+def capture_name(directory, index=0):
+    """ Return path of the capture file in the directory,
+    index distinguishes files started in the same second
+    """
+    name = time.strftime("relay-%Y%m%d-%H%M%S")
+    if index:
+        name += "-{}".format(index)
+    return os.path.join(directory, name + ".rec")
+
+
+class Recorder:
+    """ This class appends frames of the relay to the capture file.
+    Vectors are padded with zeros or truncated to the number of channels
+    of the file. The existing file is never overwritten (FileExistsError).
+    """
+
+    def __init__(self, path, inputs, outputs):
+        self.path = path
+        self.inputs = inputs
+        self.outputs = outputs
+        self.record = record_struct(inputs, outputs)
+        self.count = 0
+        self.file = open(path, 'xb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, inputs, outputs, time.time()))
+
+    @classmethod
+    def create(cls, directory, inputs, outputs):
+        """ Start the new capture file in the directory (see capture_name) """
+        index = 0
+        while True:
+            try:
+                return cls(capture_name(directory, index), inputs, outputs)
+            except FileExistsError:
+                index += 1
+
+    def _fit(self, values, n):
+        if len(values) == n:
+            return values
+        return (list(values) + [0] * n)[:n]
+
+    def write(self, seq, inputs, outputs, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        self.file.write(self.record.pack(timestamp, seq & 0xFFFFFFFF,
+                                         *self._fit(inputs, self.inputs),
+                                         *self._fit(outputs, self.outputs)))
+        self.count += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Capture:
+    """ This class reads the capture file in chunks of records
+
+    :attr inputs, outputs: number of channels
+    :attr start: time of the start of recording
+    :attr size: size of record (bytes)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        header = self.file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError("{} is not the capture file".format(path))
+        magic, version, self.inputs, self.outputs, self.start = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not the capture file".format(path))
+        self.record = record_struct(self.inputs, self.outputs)
+        self.size = self.record.size
+        self._mmap = None
+
+    def __len__(self):
+        return (os.fstat(self.file.fileno()).st_size - HEADER.size) // self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def offset(self, index):
+        return HEADER.size + index * self.size
+
+    def time(self, index):
+        """ Return time of the record """
+        self.file.seek(self.offset(index))
+        return RECORD.unpack(self.file.read(RECORD.size))[0]
+
+    def search(self, timestamp):
+        """ Return index of the first record not earlier than timestamp """
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.time(mid) < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def select(self, start=None, stop=None):
+        """ Return range (first, last) of records between start and stop times """
+        first = self.search(start) if start is not None else 0
+        last = self.search(stop) if stop is not None else len(self)
+        return first, max(first, last)
+
+    def chunks(self, first=0, last=None, chunk=4096):
+        """ Yield Chunk(first, data) of raw records from first to last """
+        if last is None:
+            last = len(self)
+        self.file.seek(self.offset(first))
+        while first < last:
+            n = min(chunk, last - first)
+            data = self.file.read(n * self.size)
+            n = len(data) // self.size
+            if not n:
+                break
+            yield Chunk(first, memoryview(data)[:n * self.size])
+            first += n
+
+    def map(self, first=0, last=None):
+        """ Return read-only view of raw records from first to last mapped
+        to memory, so processes share the capture through the page cache
+        """
+        if last is None:
+            last = len(self)
+        if self._mmap is None:
+            self._mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)[self.offset(first):self.offset(last)]
+
+    def decode(self, data):
+        """ Return list of (time, seq, inputs, outputs) of raw records """
+        n = self.inputs
+        return [(r[0], r[1], r[2:2 + n], r[2 + n:]) for r in self.record.iter_unpack(data)]
+
+    def close(self):
+        """ Views returned by map() must be released before """
+        if self._mmap is not None:
+            self._mmap.close()
+        self.file.close()
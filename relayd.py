@@ -0,0 +1,448 @@
+""" The relay daemon with the local control socket.
+
+    The daemon runs the relay independently of the GUI, so the operator
+    can close or restart the UI without interruption of the current updates,
+    and several monitors can subscribe to one relay.
+
+    Protocol: JSON messages separated by the new line.
+    Request:  {"cmd": <command>, ...arguments}
+    Response: {"ok": true, "result": ...} or {"ok": false, "error": <message>}
+
+    Commands:
+        start {"pattern": [...], "settings": {...}} - start the relay
+        stop                                      - stop the relay
+        pattern {"pattern": [...]}                - change the pattern
+        sequence {"script": {...}}                - run the sequence of patterns (see sequencer)
+        settings {"settings": {...}}              - change settings (restart relay)
+        status                                    - state of the relay
+        statistics                                - running statistics of channels
+        profile {"enabled": bool, "seconds": N}   - switch stage timers and/or capture
+                                                    sampling profile for N seconds
+        reset_statistics                          - reset running statistics
+        subscribe                                 - the connection becomes the stream
+                                                    of frames {"event": "frame", ...}
+
+    Usage: python relayd.py [--address PATH | HOST:PORT]
+"""
+
+import argparse
+from collections import deque
+import json
+import logging
+import os
+import select
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+
+import profiling
+import proxy
+from sequencer import Sequencer
+from sharedstate import Snapshot
+
+
+
+def runtime_dir():
+    """ Return the directory of the control socket which only the user can access """
+    path = os.environ.get('XDG_RUNTIME_DIR')
+    if path:
+        return path
+    return os.path.join(tempfile.gettempdir(), "degaus-{}".format(os.getuid()))
+
+
+if hasattr(socket, 'AF_UNIX'):
+    DEFAULT_ADDRESS = os.path.join(runtime_dir(), "degaus-monitor.sock")
+else:
+    # Windows has no unix-domain sockets in the standard library
+    DEFAULT_ADDRESS = ("127.0.0.1", 50217)
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """ The latest frame for one client (latest wins) """
+
+    def __init__(self):
+        self.frames = deque(maxlen=1)
+        self.event = threading.Event()
+        self.closed = False
+
+    def put(self, frame):
+        self.frames.append(frame)
+        self.event.set()
+
+    def close(self):
+        self.closed = True
+        self.event.set()
+
+
+class RelayDaemon:
+    """ This class runs the relay in the thread and executes commands of clients """
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.address = address
+        self.server = None
+
+        self.relay = None
+        self.thread = None
+        self.running = False
+        self.settings = None
+        self.pattern = None
+        self.error = None
+
+        self.subscribers = []
+        self._pending = deque(maxlen=1)
+        self._sequence = deque(maxlen=1)
+        self._lock = threading.Lock()
+
+    # Relay
+    def start(self, pattern, settings):
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Relay is already started")
+            self.relay = proxy.Relay(settings)
+            self.relay.set_pattern(pattern)
+            self.settings = dict(settings)
+            self.pattern = list(pattern)
+            self.error = None
+            self.running = True
+            self.thread = threading.Thread(target=self._serve, daemon=True)
+            self.thread.start()
+        logger.info("Relay started: %s", settings)
+
+    def stop(self):
+        with self._lock:
+            if not self.running and self.relay is None:
+                return
+            self.running = False
+            thread, self.thread = self.thread, None
+        if thread:
+            thread.join()
+        logger.info("Relay stopped")
+
+    def set_pattern(self, pattern):
+        self.pattern = list(pattern)
+        # Pattern is changed between cycles by the relay thread
+        self._pending.append(self.pattern)
+
+    def set_sequence(self, script):
+        if not self.running:
+            raise RuntimeError("Relay is not started")
+        settings = self.settings
+        # Compile here to return errors of the script to the client
+        self._sequence.append(Sequencer(script, settings['channels'], settings['imax'], settings['interval']))
+
+    def set_settings(self, settings):
+        if self.running:
+            self.stop()
+            self.start(self.pattern, settings)
+        else:
+            self.settings = dict(settings)
+
+    def status(self):
+        return {
+            "running": self.running,
+            "settings": self.settings,
+            "pattern": self.pattern,
+            "stats": self.relay.stats() if self.relay else {},
+            "subscribers": len(self.subscribers),
+            "error": self.error
+        }
+
+    def _serve(self):
+        relay = self.relay
+        try:
+            relay.serve_forever(self.settings['interval'] / 1000, lambda: self.running, self._on_cycle)
+        except Exception as e:
+            self.error = str(e)
+            self.running = False
+            logger.exception("Relay is failed")
+        finally:
+            relay.close()
+            self.relay = None
+
+    def _on_cycle(self, relay):
+        if self._pending:
+            relay.set_pattern(self._pending.popleft())
+        if self._sequence:
+            relay.set_sequence(self._sequence.popleft())
+        frame = {
+            "event": "frame",
+            "seq": relay.frames,
+            "inputs": relay.inputs,
+            "outputs": relay.outputs,
+            "stats": relay.stats()
+        }
+        for subscriber in list(self.subscribers):
+            subscriber.put(frame)
+
+    # Commands
+    def execute(self, cmd, **kwargs):
+        if cmd == 'start':
+            settings = kwargs.get('settings') or self.settings
+            if not settings:
+                raise ValueError("Settings are not specified")
+            return self.start(kwargs.get('pattern', self.pattern or []), settings)
+        elif cmd == 'stop':
+            return self.stop()
+        elif cmd == 'pattern':
+            return self.set_pattern(kwargs['pattern'])
+        elif cmd == 'sequence':
+            return self.set_sequence(kwargs['script'])
+        elif cmd == 'settings':
+            return self.set_settings(kwargs['settings'])
+        elif cmd == 'status':
+            return self.status()
+        elif cmd == 'profile':
+            return profiling.control(**kwargs)
+        elif cmd == 'statistics':
+            return self.relay.statistics() if self.relay else {}
+        elif cmd == 'reset_statistics':
+            return self.relay.reset_statistics() if self.relay else None
+        raise ValueError("Unknown command: {}".format(cmd))
+
+    def stream(self, sock, wfile):
+        """ Send frames to the subscribed client until it is disconnected """
+        subscriber = Subscriber()
+        self.subscribers.append(subscriber)
+        try:
+            while not subscriber.closed:
+                if not subscriber.event.wait(1):
+                    if _is_closed(sock):
+                        break
+                    continue
+                subscriber.event.clear()
+                if not subscriber.frames:
+                    continue
+                wfile.write(_encode(subscriber.frames.popleft()))
+                wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.subscribers.remove(subscriber)
+
+    # Server
+    def serve_forever(self):
+        if isinstance(self.address, str):
+            _prepare_socket(self.address)
+            server_class = _UnixServer
+        else:
+            server_class = _TCPServer
+
+        self.server = server_class(self.address, _Handler)
+        self.server.relay_daemon = self
+        if isinstance(self.address, str):
+            os.chmod(self.address, 0o600)
+        logger.info("Daemon is listening on %s", self.address)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stop()
+            for subscriber in list(self.subscribers):
+                subscriber.close()
+            self.server.server_close()
+            if isinstance(self.address, str):
+                try:
+                    os.unlink(self.address)
+                except FileNotFoundError:
+                    pass
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+
+
+def _prepare_socket(path):
+    """ Create the private directory of the socket and remove the stale socket.
+    Other files are never removed. The directory must belong to the user
+    and be closed for others, otherwise they could replace the socket.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if (not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid()
+            or info.st_mode & 0o077):
+        raise PermissionError("{} is not the private directory of the user".format(directory))
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError("{} exists and is not a socket".format(path))
+    os.unlink(path)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon = self.server.relay_daemon
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                cmd = request.pop('cmd')
+                if cmd == 'subscribe':
+                    self.wfile.write(_encode({"ok": True, "result": None}))
+                    daemon.stream(self.connection, self.wfile)
+                    return
+                response = {"ok": True, "result": daemon.execute(cmd, **request)}
+            except Exception as e:
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write(_encode(response))
+
+
+if hasattr(socket, 'AF_UNIX'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _encode(message):
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode()
+
+
+def _is_closed(sock):
+    """ Check the end of stream from the client without blocking """
+    readable, _, _ = select.select([sock], [], [], 0)
+    return bool(readable) and not sock.recv(1, socket.MSG_PEEK)
+
+
+def _connect(address, timeout=None):
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(address)
+    return sock
+
+
+class RelayClient:
+    """ This class represents the client of the relay daemon.
+    The client can be attached and detached at any time,
+    the relay continues to work without clients.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=5):
+        self.address = address
+        self.sock = _connect(address, timeout)
+        self.rfile = self.sock.makefile('rb')
+        self.pattern = None
+
+        self.frames = deque(maxlen=1)
+        self._stream = None
+        self._thread = None
+        self._last = None
+
+    def request(self, cmd, **kwargs):
+        kwargs['cmd'] = cmd
+        self.sock.sendall(_encode(kwargs))
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("Daemon closed the connection")
+        response = json.loads(line)
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def start(self, pattern, settings):
+        self.pattern = list(pattern)
+        return self.request('start', pattern=self.pattern, settings=settings)
+
+    def stop(self):
+        return self.request('stop')
+
+    def set_pattern(self, pattern):
+        if pattern != self.pattern:
+            self.pattern = list(pattern)
+            self.request('pattern', pattern=self.pattern)
+
+    def set_settings(self, settings):
+        return self.request('settings', settings=settings)
+
+    def set_sequence(self, script):
+        return self.request('sequence', script=script)
+
+    def status(self):
+        return self.request('status')
+
+    def statistics(self):
+        return self.request('statistics')
+
+    def poll_statistics(self):
+        """ The daemon answers at once, so it is the same as statistics() """
+        return self.statistics()
+
+    def profile(self, enabled=None, seconds=0):
+        return self.request('profile', enabled=enabled, seconds=seconds)
+
+    def reset_statistics(self):
+        return self.request('reset_statistics')
+
+    def subscribe(self):
+        """ Receive frames in the background thread, see snapshot() """
+        self._stream = _connect(self.address)
+        self._stream.sendall(_encode({"cmd": "subscribe"}))
+        self._thread = threading.Thread(target=self._receive, daemon=True)
+        self._thread.start()
+
+    def _receive(self):
+        rfile = self._stream.makefile('rb')
+        try:
+            rfile.readline()
+            for line in rfile:
+                self.frames.append(json.loads(line))
+        except (OSError, ValueError):
+            pass
+
+    def snapshot(self):
+        """ Return the latest received frame or None """
+        if self.frames:
+            frame = self.frames.popleft()
+            self._last = Snapshot(frame['seq'], frame['stats'], frame['inputs'], frame['outputs'],
+                                  frame['stats']['alarms']['output'])
+        return self._last
+
+    def close(self):
+        """ Detach from the daemon. The relay is not stopped """
+        if self._stream:
+            try:
+                self._stream.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._stream.close()
+            self._thread.join()
+            self._stream = None
+        self.rfile.close()
+        self.sock.close()
+
+
+def parse_address(text):
+    if text and ':' in text and not os.path.isabs(text):
+        host, port = text.rsplit(':', 1)
+        return (host, int(port))
+    return text or DEFAULT_ADDRESS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Relay daemon of the KF1 serial channel")
+    parser.add_argument('--address', help="unix socket path or HOST:PORT")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    daemon = RelayDaemon(parse_address(args.address))
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+""" Run the relay loop in the separate process.
+
+    The relay process does not share the GIL with Qt painting, so a freeze
+    or crash of the GUI never interrupts the feed of the compensator.
+    The latest state is published in the shared memory (see sharedstate),
+    commands (pattern, settings, stop) are passed through the queue.
+    Replies are sent at the next cycle with the id of the request,
+    so the late reply is never taken for the answer to another request.
+"""
+
+import logging
+import multiprocessing
+import queue
+import time
+
+import profiling
+import proxy
+from sequencer import Sequencer
+from sharedstate import SharedState, unique_name
+
+logger = logging.getLogger(__name__)
+
+
+def serve(pattern, settings, commands, replies, name):
+    """ Entry point of the relay process, the state is published in the block name """
+    state = SharedState(name=name, create=True)
+    try:
+        relay = proxy.Relay(settings)
+    except Exception:
+        # E.g. the port is busy; the exit code is reported by the GUI
+        logger.exception("Relay is not started")
+        state.close()
+        raise
+    relay.set_pattern(pattern)
+    running = True
+
+    def _on_cycle(relay):
+        nonlocal running
+        stats = relay.stats()
+        state.publish(relay.inputs, relay.outputs, stats, stats['alarms']['output'])
+        while True:
+            try:
+                command, value, request = commands.get_nowait()
+            except queue.Empty:
+                return
+            if command == 'pattern':
+                relay.set_pattern(value)
+            elif command == 'sequence':
+                try:
+                    relay.set_sequence(Sequencer(value, settings['channels'], settings['imax'],
+                                                 settings['interval']))
+                except (KeyError, ValueError) as e:
+                    logger.error("Wrong sequence: %s", e)
+            elif command == 'profile':
+                replies.put((request, profiling.control(**value)))
+            elif command == 'statistics':
+                replies.put((request, relay.statistics()))
+            elif command == 'reset_statistics':
+                relay.reset_statistics()
+            elif command == 'stop':
+                running = False
+            else:
+                raise ValueError("Unknown command: {}".format(command))
+
+    try:
+        relay.serve_forever(settings['interval'] / 1000, lambda: running, _on_cycle)
+    finally:
+        relay.close()
+        state.close()
+
+
+class RelayProcess:
+    """ This class controls the relay process and reads its state.
+
+    :param name: name of the shared memory block, unique by default.
+        Other readers attach to the block by this name (SharedState(name)).
+    """
+
+    def __init__(self, name=None):
+        self.name = name or unique_name()
+        self.process = None
+        self.commands = None
+        self.replies = None
+        self.state = None
+        self.pattern = None
+
+        self._request = 0
+        self._received = {}
+        self._abandoned = set()
+        self._statistics_request = None
+        self.last_statistics = {}
+
+    def start(self, pattern, settings):
+        self.pattern = list(pattern)
+        self.commands = multiprocessing.Queue()
+        self.replies = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=serve, args=(list(pattern), dict(settings), self.commands, self.replies, self.name),
+            daemon=True)
+        self.process.start()
+
+    def _send(self, command, value=None):
+        """ Put the command and return id of the request """
+        self._request += 1
+        self.commands.put((command, value, self._request))
+        return self._request
+
+    def _collect(self, timeout=None):
+        """ Take replies from the queue (wait for one at most timeout seconds) """
+        block = timeout is not None
+        while True:
+            try:
+                request, value = self.replies.get(block, timeout)
+            except queue.Empty:
+                return
+            if request in self._abandoned:
+                self._abandoned.discard(request)
+            else:
+                self._received[request] = value
+            block = False
+
+    def _wait(self, request, timeout, default=None):
+        deadline = time.monotonic() + timeout
+        while request not in self._received:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                self._abandoned.add(request)
+                return default
+            self._collect(left)
+        return self._received.pop(request)
+
+    def set_pattern(self, pattern):
+        if pattern != self.pattern:
+            self.pattern = list(pattern)
+            self._send('pattern', self.pattern)
+
+    def set_sequence(self, script):
+        self._send('sequence', script)
+
+    def statistics(self, timeout=1):
+        """ Return running statistics of channels or {} if the relay does not answer """
+        return self._wait(self._send('statistics'), timeout, {})
+
+    def poll_statistics(self):
+        """ Return the latest received statistics without waiting
+        and request the new one if the previous request is answered
+        """
+        self._collect()
+        if self._statistics_request in self._received:
+            self.last_statistics = self._received.pop(self._statistics_request)
+            self._statistics_request = None
+        if self._statistics_request is None:
+            self._statistics_request = self._send('statistics')
+        return self.last_statistics
+
+    def reset_statistics(self):
+        self._send('reset_statistics')
+
+    def profile(self, enabled=None, seconds=0, timeout=1):
+        """ Switch stage timers and/or capture profile in the relay process """
+        return self._wait(self._send('profile', {"enabled": enabled, "seconds": seconds}), timeout)
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def snapshot(self):
+        """ Return the latest state or None if the relay is not started yet """
+        if self.state is None:
+            try:
+                self.state = SharedState(name=self.name)
+            except FileNotFoundError:
+                return None
+        return self.state.read()
+
+    def stop(self, timeout=5):
+        if self.state is not None:
+            self.state.close()
+            self.state = None
+        if self.process is None:
+            return
+        self._send('stop')
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
@@ -0,0 +1,127 @@
+""" Running per-channel statistics with constant memory.
+
+    RunningStats uses Welford's algorithm over the whole channel vector,
+    DecayingStats is exponentially weighted mean and variance, so recent
+    values have more weight. Both keep only a few values per channel
+    regardless of uptime.
+"""
+
+import csv
+import math
+
+FIELDS = ("count", "min", "max", "mean", "std")
+
+
+class RunningStats:
+    """ Min/max/mean/standard deviation of every channel since reset.
+
+    :param window: number of frames after which the statistics is reset
+        automatically (0 - never); the result of the finished window
+        is kept in `previous`
+    """
+
+    def __init__(self, window=0):
+        self.window = window
+        self.previous = None
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = []
+        self.m2 = []
+        self.min = []
+        self.max = []
+
+    def update(self, values):
+        if self.count and len(values) != len(self.mean):
+            self.reset()
+
+        if not self.count:
+            self.count = 1
+            self.mean = [float(v) for v in values]
+            self.m2 = [0.0] * len(values)
+            self.min = list(values)
+            self.max = list(values)
+            return
+
+        self.count += 1
+        n = self.count
+        deltas = [v - m for v, m in zip(values, self.mean)]
+        self.mean = [m + d / n for m, d in zip(self.mean, deltas)]
+        self.m2 = [s + d * (v - m) for s, d, v, m in zip(self.m2, deltas, values, self.mean)]
+        self.min = [v if v < lo else lo for v, lo in zip(values, self.min)]
+        self.max = [v if v > hi else hi for v, hi in zip(values, self.max)]
+
+        if self.window and self.count >= self.window:
+            self.previous = self.result()
+            self.reset()
+
+    def std(self):
+        if self.count < 2:
+            return [0.0] * len(self.mean)
+        return [math.sqrt(s / (self.count - 1)) for s in self.m2]
+
+    def result(self):
+        """ Return statistics as dict of per channel lists """
+        return {
+            "count": self.count,
+            "min": list(self.min),
+            "max": list(self.max),
+            "mean": list(self.mean),
+            "std": self.std()
+        }
+
+
+class DecayingStats:
+    """ Exponentially weighted mean and standard deviation of every channel
+
+    :param alpha: weight of the new value (0 < alpha <= 1)
+    """
+
+    def __init__(self, alpha=0.01):
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = []
+        self.var = []
+
+    def update(self, values):
+        if not self.count or len(values) != len(self.mean):
+            self.count = 1
+            self.mean = [float(v) for v in values]
+            self.var = [0.0] * len(values)
+            return
+
+        self.count += 1
+        a = self.alpha
+        deltas = [v - m for v, m in zip(values, self.mean)]
+        self.mean = [m + a * d for m, d in zip(self.mean, deltas)]
+        self.var = [(1 - a) * (s + a * d * d) for s, d in zip(self.var, deltas)]
+
+    def result(self):
+        return {
+            "count": self.count,
+            "mean": list(self.mean),
+            "std": [math.sqrt(s) for s in self.var]
+        }
+
+
+def write_csv(path, results):
+    """ Write results {name: result} to the CSV file, one row per channel """
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(("name", "channel") + FIELDS)
+        for name, result in results.items():
+            for channel, row in enumerate(_rows(result), 1):
+                writer.writerow((name, channel) + row)
+
+
+def _rows(result):
+    n = len(result.get('mean', []))
+    columns = [result.get(field) for field in FIELDS[1:]]
+    for i in range(n):
+        yield (result['count'],) + tuple(c[i] if c is not None else "" for c in columns)
@@ -0,0 +1,125 @@
+""" Sequencer of patterns for timed degaussing test procedures.
+
+    The script is the JSON file:
+    {
+        "name": "Calibration",
+        "steps": [
+            {"pattern": "Max", "channels": "1-10", "duration": 5000},
+            {"pattern": "Null", "duration": 2000},
+            {"pattern": ["Min", "Null", "L"], "frames": 3}
+        ]
+    }
+
+    pattern  - state for selected channels (others are Null) or list of states
+    channels - numbers of channels (from 1), e.g. "1-10,15"; all channels by default
+    duration - duration of step (ms), it is rounded to whole frames of the relay
+    frames   - duration of step in frames (instead of duration)
+
+    All steps are compiled when the script is loaded, so the relay switches
+    patterns on the frame boundary without any processing.
+"""
+
+import json
+import logging
+import time
+
+import proxy
+
+logger = logging.getLogger(__name__)
+
+STATES = ("Max", "Min", "Null", "L")
+
+
+def parse_channels(text, channels):
+    """ Return set of channel indexes (from 0) by string "1-10,15" """
+    if not text:
+        return set(range(channels))
+    selected = set()
+    for part in str(text).split(','):
+        first, _, last = part.strip().partition('-')
+        first = int(first)
+        last = int(last) if last else first
+        if not 1 <= first <= last <= channels:
+            raise ValueError("Wrong channels: {}".format(part))
+        selected.update(range(first - 1, last))
+    return selected
+
+
+def compile_step(step, channels, imax, interval):
+    """ Return (states, handler, frames) of the step """
+    pattern = step['pattern']
+    if isinstance(pattern, str):
+        selected = parse_channels(step.get('channels'), channels)
+        states = [pattern if i in selected else 'Null' for i in range(channels)]
+    else:
+        states = list(pattern)[:channels]
+        states += ['Null'] * (channels - len(states))
+
+    unknown = set(states) - set(STATES)
+    if unknown:
+        raise ValueError("Unknown states: {}".format(", ".join(sorted(unknown))))
+
+    if 'frames' in step:
+        frames = int(step['frames'])
+    else:
+        frames = round(step['duration'] / interval)
+    if frames < 1:
+        raise ValueError("Step must be at least one frame")
+
+    values = proxy.message_pattern(states, imax=(imax - 0.01))
+    return states, proxy.PatternHandler(pattern=values, channels=channels), frames
+
+
+class Sequencer:
+    """ This class switches precompiled patterns on the frame boundaries
+
+    :param script: dict with list of steps
+    :param channels: number of channels
+    :param imax: max current (A)
+    :param interval: interval of the relay (ms)
+    """
+
+    def __init__(self, script, channels, imax, interval):
+        self.script = script
+        self.name = script.get('name', '')
+        self.steps = [compile_step(step, channels, imax, interval) for step in script['steps']]
+        if not self.steps:
+            raise ValueError("Script has no steps")
+
+        self.index = -1
+        self.left = 0
+        self.events = []
+
+    @classmethod
+    def load(cls, path, settings):
+        """ Load the script from the JSON file for the relay with settings """
+        with open(path, encoding='utf-8') as f:
+            script = json.load(f)
+        return cls(script, settings['channels'], settings['imax'], settings['interval'])
+
+    @property
+    def finished(self):
+        return self.index >= len(self.steps)
+
+    def next(self):
+        """ Invoked by the relay for every frame.
+        Returns the handler of the new step or None if the step is not changed.
+        """
+        if self.left > 1:
+            self.left -= 1
+            return None
+
+        self.index += 1
+        if self.finished:
+            self.events.append((time.time(), self.index))
+            logger.info("Sequence '%s' is finished", self.name)
+            return None
+
+        states, handler, self.left = self.steps[self.index]
+        self.events.append((time.time(), self.index))
+        logger.info("Sequence '%s' step %d/%d: %s", self.name, self.index + 1, len(self.steps),
+                    ",".join(states))
+        return handler
+
+    def progress(self):
+        return {"step": min(self.index + 1, len(self.steps)), "steps": len(self.steps)}
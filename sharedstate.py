@@ -0,0 +1,145 @@
+""" The latest state of the relay published in the shared memory block.
+
+    The block is written by the relay process only and can be read by any
+    local process (GUI, diagnostic tools) without copies of the queues
+    or IPC round-trips. Every relay process has its own block, the name is
+    passed to readers (see relayproc.RelayProcess.name). Consistency of the snapshot is provided by seqlock:
+    the writer makes the sequence odd before update and even after it,
+    the reader retries while the sequence is odd or was changed.
+
+    Layout of the block (native byte order):
+    | seq (Q) | stats (Q * len(STATS)) | n_input (H) | n_output (H) | inputs (h * MAX) | outputs (h * MAX) |
+    | alarms of outputs (B * MAX) |
+"""
+
+from multiprocessing import shared_memory
+import os
+import secrets
+import struct
+import sys
+
+# Prefix of names of blocks
+NAME = "degaus"
+
+MAX_CHANNELS = 150
+
+STATS = ("frames", "skipped", "written", "superseded", "lost", "held", "outages", "step", "steps")
+
+_SEQ = struct.Struct("Q")
+_HEADER = struct.Struct("{}QHH".format(len(STATS)))
+_VALUES = struct.Struct("{}h".format(MAX_CHANNELS))
+_FLAGS = struct.Struct("{}B".format(MAX_CHANNELS))
+
+_OFFSET_HEADER = _SEQ.size
+_OFFSET_INPUTS = _OFFSET_HEADER + _HEADER.size
+_OFFSET_OUTPUTS = _OFFSET_INPUTS + _VALUES.size
+
+_OFFSET_ALARMS = _OFFSET_OUTPUTS + _VALUES.size
+
+SIZE = _OFFSET_ALARMS + _FLAGS.size
+
+# Blocks created by this process
+_owned = set()
+
+
+def unique_name():
+    """ Return the new name of the block (short enough for macOS) """
+    return "{}-{}-{}".format(NAME, os.getpid(), secrets.token_hex(4))
+
+
+class Snapshot:
+    """ Consistent copy of the relay state """
+
+    def __init__(self, seq, stats, inputs, outputs, alarms=()):
+        self.seq = seq
+        self.stats = stats
+        self.inputs = inputs
+        self.outputs = outputs
+        self.alarms = list(alarms)
+
+    def __repr__(self):
+        return "Snapshot(seq={}, stats={}, inputs={}, outputs={}, alarms={})".format(
+            self.seq, self.stats, self.inputs, self.outputs, self.alarms)
+
+
+class SharedState:
+    """ This class represents the shared memory block of the relay state.
+
+    :param name: name of the block (see unique_name)
+    :param create: create new block (writer) or attach to existing (reader).
+        FileExistsError is raised if the name is in use.
+    """
+
+    def __init__(self, name, create=False):
+        self.owner = create
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SIZE)
+            _owned.add(self.shm._name)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            _untrack(self.shm)
+        self.buf = self.shm.buf
+        self._seq = 0
+        if create:
+            _SEQ.pack_into(self.buf, 0, 0)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def publish(self, inputs, outputs, stats, alarms=()):
+        """ Write new state. Only one writer is allowed.
+        Alarms are numbers (from 1) of output channels with alarm.
+        """
+        inputs = inputs[:MAX_CHANNELS]
+        outputs = outputs[:MAX_CHANNELS]
+
+        self._seq += 1
+        _SEQ.pack_into(self.buf, 0, self._seq)
+
+        _HEADER.pack_into(self.buf, _OFFSET_HEADER,
+                          *[stats.get(key, 0) for key in STATS],
+                          len(inputs), len(outputs))
+        struct.pack_into("{}h".format(len(inputs)), self.buf, _OFFSET_INPUTS, *inputs)
+        struct.pack_into("{}h".format(len(outputs)), self.buf, _OFFSET_OUTPUTS, *outputs)
+        flags = [0] * MAX_CHANNELS
+        for channel in alarms:
+            if channel <= MAX_CHANNELS:
+                flags[channel - 1] = 1
+        _FLAGS.pack_into(self.buf, _OFFSET_ALARMS, *flags)
+
+        self._seq += 1
+        _SEQ.pack_into(self.buf, 0, self._seq)
+
+    def read(self, retries=1000):
+        """ Return consistent snapshot or None if nothing is published """
+        for _ in range(retries):
+            seq, = _SEQ.unpack_from(self.buf, 0)
+            if seq & 1:
+                continue
+            header = _HEADER.unpack_from(self.buf, _OFFSET_HEADER)
+            n_input, n_output = header[-2:]
+            inputs = list(struct.unpack_from("{}h".format(n_input), self.buf, _OFFSET_INPUTS))
+            outputs = list(struct.unpack_from("{}h".format(n_output), self.buf, _OFFSET_OUTPUTS))
+            flags = _FLAGS.unpack_from(self.buf, _OFFSET_ALARMS)
+            if seq == _SEQ.unpack_from(self.buf, 0)[0]:
+                if seq == 0:
+                    return None
+                alarms = [i + 1 for i, flag in enumerate(flags) if flag]
+                return Snapshot(seq // 2, dict(zip(STATS, header)), inputs, outputs, alarms)
+        raise TimeoutError("Shared state is not consistent")
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+            _owned.discard(self.shm._name)
+
+
+def _untrack(shm):
+    """ Reader must not unlink the block on exit (bpo-39959) """
+    if sys.platform.startswith('win') or shm._name in _owned:
+        return
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(shm._name, "shared_memory")
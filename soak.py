@@ -0,0 +1,316 @@
+""" Soak test of the relay for long-duration, high-rate relaying.
+
+    The full relay (input -> handlers -> output) runs at maximum rate,
+    and every N seconds the resident memory, open file descriptors,
+    objects tracked by GC, GC collections and latency percentiles
+    of the cycle are sampled. At the end the trend (least squares line)
+    of every metric after warmup is checked against the thresholds.
+
+    Ports:
+    memory - in-memory ADC and compensator, the relay is driven by Relay.step
+    pty    - pseudo terminals (Linux/macOS), the relay is driven by proxy.run
+             with the new settings dict every cycle as the GUI does,
+             so ports are opened by name as in the field
+
+    Usage: python soak.py [--ports memory] [--duration 3600] [--sample 10] [--csv soak.csv]
+    The exit code is 1 if any metric grows beyond its threshold.
+"""
+
+import argparse
+from array import array
+from collections import namedtuple
+import csv
+import gc
+import math
+import os
+import sys
+import threading
+import time
+
+import proxy
+
+Sample = namedtuple("Sample", "time frames rate rss fds objects gc0 gc1 gc2 p50 p99 max")
+
+# Latency histogram: 8 buckets per octave of microseconds (about 9% resolution)
+BUCKETS_PER_OCTAVE = 8
+BUCKETS = BUCKETS_PER_OCTAVE * 25
+
+
+def rss():
+    """ Return resident memory of the process (bytes) or None """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak value, but it grows with leaks as well
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def open_fds():
+    """ Return number of open file descriptors or None """
+    for path in ('/proc/self/fd', '/dev/fd'):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            pass
+    return None
+
+
+class Histogram:
+    """ Latency histogram with constant memory """
+
+    def __init__(self):
+        self.buckets = array('l', [0] * BUCKETS)
+        self.reset()
+
+    def reset(self):
+        for i in range(BUCKETS):
+            self.buckets[i] = 0
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds):
+        us = seconds * 1e6
+        index = int(math.log2(us) * BUCKETS_PER_OCTAVE) if us > 1 else 0
+        self.buckets[min(index, BUCKETS - 1)] += 1
+        self.count += 1
+        if us > self.max:
+            self.max = us
+
+    def percentile(self, q):
+        """ Return upper bound (us) of the bucket with q-th percentile """
+        if not self.count:
+            return 0.0
+        rank = math.ceil(q / 100 * self.count)
+        total = 0
+        for index, n in enumerate(self.buckets):
+            total += n
+            if total >= rank:
+                return min(2 ** ((index + 1) / BUCKETS_PER_OCTAVE), self.max)
+        return self.max
+
+
+class MemoryADC:
+    """ ADC which returns the new valid message on every read """
+
+    def __init__(self, channels, encoder=proxy.INPUT):
+        self.encoder = encoder
+        self.values = [0] * channels
+        self.seq = 0
+
+    def read(self, size=1):
+        self.seq += 1
+        self.values[0] = self.seq % 600 - 300
+        return self.encoder.encode(self.values)
+
+    def close(self):
+        pass
+
+
+class NullPort:
+    """ Compensator which only counts received bytes """
+
+    out_waiting = 0
+
+    def __init__(self):
+        self.received = 0
+
+    def write(self, message):
+        self.received += len(message)
+
+    def close(self):
+        pass
+
+
+class PtyLink(threading.Thread):
+    """ Pseudo terminal; the thread writes messages to it (ADC)
+    or reads everything written by the relay (compensator)
+    """
+
+    def __init__(self, message=None):
+        super().__init__(daemon=True)
+        import tty
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.message = message
+        self.bytes = 0
+        self._running = True
+
+    def run(self):
+        try:
+            while self._running:
+                if self.message:
+                    self.bytes += os.write(self.master, self.message)
+                else:
+                    self.bytes += len(os.read(self.master, 4096))
+        except OSError:
+            pass
+
+    def close(self):
+        self._running = False
+        os.close(self.slave)
+        os.close(self.master)
+
+
+class Soak:
+    """ This class runs the step at maximum rate and samples metrics
+
+    :param step: function which runs one cycle of the relay
+    :param sample: period of sampling (seconds)
+    """
+
+    def __init__(self, step, sample=10.0, clock=time.monotonic):
+        self.step = step
+        self.sample = sample
+        self.clock = clock
+        self.samples = []
+        self.latency = Histogram()
+
+    def measure(self, elapsed, frames, rate):
+        stats = gc.get_stats()
+        return Sample(
+            round(elapsed, 3), frames, round(rate, 1), rss(), open_fds(), len(gc.get_objects()),
+            stats[0]['collections'], stats[1]['collections'], stats[2]['collections'],
+            round(self.latency.percentile(50), 1), round(self.latency.percentile(99), 1),
+            round(self.latency.max, 1)
+        )
+
+    def run(self, duration, callback=None):
+        """ Run for duration seconds, callback is invoked with every sample """
+        step = self.step
+        latency = self.latency
+        perf_counter = time.perf_counter
+        start = self.clock()
+        deadline = start + self.sample
+        frames = window = 0
+        while True:
+            begin = perf_counter()
+            step()
+            latency.add(perf_counter() - begin)
+            frames += 1
+            window += 1
+            now = self.clock()
+            if now < deadline:
+                continue
+            sample = self.measure(now - start, frames, window / (now - deadline + self.sample))
+            self.samples.append(sample)
+            if callback:
+                callback(sample)
+            latency.reset()
+            window = 0
+            deadline += self.sample
+            if now - start >= duration:
+                return self.samples
+
+
+def trend(points):
+    """ Return (start value, growth over the period) of the least squares line """
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    slope = sum((t - mean_t) * (y - mean_y) for t, y in points) / var if var else 0.0
+    first, last = points[0][0], points[-1][0]
+    return mean_y - slope * (mean_t - first), slope * (last - first)
+
+
+def check(samples, warmup=0.1, max_rss=0.1, max_fds=1, max_objects=0.1, max_latency=0.5):
+    """ Return list of failures. The limits of rss, objects and latency (p99)
+    are relative to the start value, the limit of fds is absolute.
+    The first part (warmup) of samples is skipped.
+    """
+    samples = samples[int(len(samples) * warmup):]
+    failures = []
+    for field, limit, relative in (("rss", max_rss, True), ("fds", max_fds, False),
+                                   ("objects", max_objects, True), ("p99", max_latency, True)):
+        points = [(s.time, getattr(s, field)) for s in samples if getattr(s, field) is not None]
+        if len(points) < 3:
+            continue
+        start, growth = trend(points)
+        value = growth / start if relative and start else growth
+        if value > limit:
+            failures.append("{} grows from {:.0f} by {:.0f} ({:.3g} > {})".format(
+                field, start, growth, value, limit))
+    return failures
+
+
+def relay_settings(channels, port_input="VCOM", port_output="VCOM"):
+    return {
+        "port_input": port_input, "port_output": port_output,
+        "imax": 10, "channels": channels, "channels_byte": True, "interval": 0,
+        "statistics": {"window": 1000, "alpha": 0.01},
+        "alarms": {"hysteresis": 2, "input": {"min": -300, "max": 300}}
+    }
+
+
+def run_memory(duration, sample, channels=150, callback=None):
+    relay = proxy.Relay(relay_settings(channels), reader=MemoryADC(channels), port=NullPort())
+    relay.set_pattern(['L'] * channels)
+    try:
+        return Soak(relay.step, sample).run(duration, callback)
+    finally:
+        relay.close()
+
+
+def run_pty(duration, sample, channels=150, callback=None):
+    # PortInput reads messages of 6 channels
+    adc = PtyLink(proxy.INPUT.encode([150, -150, 0, 1, 2, 3]))
+    compensator = PtyLink()
+    adc.start()
+    compensator.start()
+    settings = relay_settings(channels, adc.port, compensator.port)
+    pattern = ['L'] * channels
+    try:
+        return Soak(lambda: proxy.run(pattern, dict(settings)), sample).run(duration, callback)
+    finally:
+        proxy.stop()
+        adc.close()
+        compensator.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak test of the relay")
+    parser.add_argument('--ports', choices=('memory', 'pty'), default='memory')
+    parser.add_argument('--duration', type=float, default=3600, help="seconds")
+    parser.add_argument('--sample', type=float, default=10, help="period of sampling, seconds")
+    parser.add_argument('--channels', type=int, default=150)
+    parser.add_argument('--csv', help="write samples to the file")
+    parser.add_argument('--warmup', type=float, default=0.1, help="part of samples to skip")
+    parser.add_argument('--max-rss', type=float, default=0.1, help="relative growth of memory")
+    parser.add_argument('--max-fds', type=float, default=1, help="growth of open files")
+    parser.add_argument('--max-objects', type=float, default=0.1, help="relative growth of objects")
+    parser.add_argument('--max-latency', type=float, default=0.5, help="relative growth of p99")
+    args = parser.parse_args(argv)
+
+    def show(sample):
+        print("{0.time:>10.0f} s {0.frames:>12} frames {0.rate:>10.0f}/s rss={0.rss} fds={0.fds} "
+              "objects={0.objects} p50={0.p50} p99={0.p99} max={0.max} us".format(sample), flush=True)
+
+    runner = run_memory if args.ports == 'memory' else run_pty
+    samples = runner(args.duration, args.sample, args.channels, show)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(Sample._fields)
+            writer.writerows(samples)
+
+    failures = check(samples, args.warmup, args.max_rss, args.max_fds, args.max_objects,
+                     args.max_latency)
+    for failure in failures:
+        print("FAIL:", failure)
+    if not failures:
+        print("OK: {} samples, {} frames".format(len(samples), samples[-1].frames if samples else 0))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
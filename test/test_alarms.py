@@ -0,0 +1,37 @@
+import unittest
+
+import alarms
+
+
+class TestAlarmMonitor(unittest.TestCase):
+    def test_limits_with_hysteresis(self):
+        monitor = alarms.AlarmMonitor('input', min=-100, max=[100, 50], hysteresis=5)
+        self.assertEqual([], monitor.update([0, 0]))
+        self.assertEqual([('input', 2, 'high', True, 60)], monitor.update([0, 60]))
+        # Inside hysteresis band the alarm is kept
+        self.assertEqual([], monitor.update([0, 48]))
+        self.assertEqual([2], monitor.alarms())
+        self.assertEqual([('input', 2, 'high', False, 44)], monitor.update([0, 44]))
+        self.assertEqual([('input', 1, 'low', True, -101)], monitor.update([-101, 0]))
+        self.assertEqual([1], monitor.alarms())
+
+    def test_rate(self):
+        monitor = alarms.AlarmMonitor('output', rate=100)
+        monitor.update([0, 0])
+        self.assertEqual([('output', 1, 'rate', True, 200)], monitor.update([200, 50]))
+        self.assertEqual([('output', 1, 'rate', False, 250)], monitor.update([250, 50]))
+
+    def test_stuck(self):
+        monitor = alarms.AlarmMonitor('input', stuck=3, hysteresis=1)
+        events = [monitor.update([10, v]) for v in (0, 5, 10, 15)]
+        self.assertEqual([[], [], [], [('input', 1, 'stuck', True, 10)]], events)
+        self.assertEqual([('input', 1, 'stuck', False, 20)], monitor.update([20, 20]))
+
+    def test_from_settings(self):
+        self.assertIsNone(alarms.from_settings('output', {"input": {"max": 1}}))
+        monitor = alarms.from_settings('input', {"hysteresis": 3, "input": {"max": 1}})
+        self.assertEqual(3, monitor.hysteresis)
+
+
+if __name__ == "__main__":
+    unittest.main()
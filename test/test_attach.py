@@ -0,0 +1,66 @@
+import importlib.util
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+import relayd
+
+SETTINGS = {
+    "port_input": "VCOM",
+    "port_output": "VCOM",
+    "header": "CM2",
+    "imax": 55,
+    "channels": 48,
+    "channels_byte": True,
+    "interval": 100
+}
+
+
+@unittest.skipUnless(importlib.util.find_spec('PyQt5'), "PyQt5 is required")
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "unix sockets are required")
+class TestAttach(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5.QtWidgets import QApplication
+        import proxyui
+
+        self.app = QApplication.instance() or QApplication([])
+        self.address = os.path.join(tempfile.mkdtemp(), "relayd.sock")
+        self.daemon = relayd.RelayDaemon(self.address)
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+        while not os.path.exists(self.address):
+            time.sleep(0.01)
+        self.proxyui = proxyui
+        self.config = proxyui.config
+        proxyui.config = dict(self.config, relay=dict(self.config['relay'], address=self.address))
+
+    def tearDown(self):
+        self.proxyui.config = self.config
+        self.daemon.shutdown()
+        self.thread.join()
+
+    def test_attach_keeps_pattern(self):
+        pattern = ['Max', 'Min', 'L'] + ['Null'] * 45
+        client = relayd.RelayClient(self.address)
+        client.start(pattern, SETTINGS)
+        client.close()
+
+        ui = self.proxyui.ProxyApp()
+        ui.on_attach(True)
+        try:
+            self.assertEqual(pattern, ui.get_pattern())
+            self.assertEqual(48, ui.degaus_config['channels'])
+            self.assertEqual(55, ui.degaus_config['imax'])
+            ui.on_run()
+            self.assertEqual(pattern, ui.client.status()['pattern'])
+        finally:
+            ui.detach()
+            ui.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
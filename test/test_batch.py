@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+import batch
+import recorder
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "capture.rec")
+        rec = recorder.Recorder(self.path, 3, 3)
+        for i in range(20):
+            rec.write(i, [i * 10, 0, 0], [0, 0, 0], timestamp=1000.0 + i)
+        rec.close()
+        self.configs = [
+            {"name": "live", "pattern": "L", "imax": 10},
+            {"name": "max", "pattern": "Max", "channels": "2", "slew_rate": 3,
+             "alarms": {"output": {"max": 500}}},
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_in_process(self):
+        results = batch.run_batch(self.path, self.configs, processes=1, start=1010)
+        self.assertEqual(["live", "max"], list(results))
+        live = results["live"]
+        self.assertEqual(10, live["count"])
+        # 190 V of 300 V with imax 10 A
+        self.assertEqual([333, 333, 333], live["min"])
+        self.assertEqual([633, 633, 633], live["max"])
+
+        limited = results["max"]
+        self.assertEqual([0, 300, 0], limited["min"])
+        self.assertEqual([0, 999, 0], limited["max"])
+        self.assertEqual(1, limited["alarms"])
+
+    def test_pool(self):
+        results = batch.run_batch(self.path, self.configs, processes=2, every=5)
+        self.assertEqual(batch.run_batch(self.path, self.configs, processes=1, every=5), results)
+        self.assertEqual(4, results["live"]["count"])
+
+    def test_unique_names(self):
+        with self.assertRaises(ValueError):
+            batch.run_batch(self.path, [{"name": "a"}, {"name": "a"}], processes=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
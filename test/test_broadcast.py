@@ -0,0 +1,105 @@
+import socket
+import time
+import unittest
+
+import broadcast
+
+
+class TestFrame(unittest.TestCase):
+    def test_encode_decode(self):
+        data = broadcast.encode_frame(7, [300, -5], [999, -999, 0], timestamp=1.5)
+        self.assertEqual(broadcast.HEADER.size + 10, len(data))
+        self.assertEqual(len(data), broadcast.frame_size(data))
+        frame = broadcast.decode_frame(data)
+        self.assertEqual(broadcast.Frame(7, 1.5, [300, -5], [999, -999, 0]), frame)
+
+    def test_is_multicast(self):
+        self.assertTrue(broadcast._is_multicast("239.1.2.3"))
+        self.assertFalse(broadcast._is_multicast("127.0.0.1"))
+        self.assertFalse(broadcast._is_multicast("localhost"))
+        self.assertFalse(broadcast._is_multicast(""))
+
+
+class TestPublisher(unittest.TestCase):
+    def test_udp(self):
+        probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        probe.bind(("127.0.0.1", 0))
+        address = probe.getsockname()
+        probe.close()
+
+        subscriber = broadcast.UdpSubscriber(address, timeout=5)
+        publisher = broadcast.FramePublisher(udp=address)
+        publisher.publish(1, [1, 2], [3])
+        self.assertEqual([3], subscriber.receive().outputs)
+        publisher.close()
+        subscriber.close()
+
+    def test_tcp(self):
+        publisher = broadcast.FramePublisher(tcp=("127.0.0.1", 0))
+        subscribers = [broadcast.TcpSubscriber(publisher.address, timeout=5) for _ in range(2)]
+        while len(publisher.clients) < 2:
+            time.sleep(0.01)
+
+        for seq in range(1, 4):
+            publisher.publish(seq, [seq], [seq * 10])
+        for subscriber in subscribers:
+            self.assertEqual([1, 2, 3], [subscriber.receive().seq for _ in range(3)])
+            subscriber.close()
+        publisher.close()
+
+    def test_slow_client(self):
+        publisher = broadcast.FramePublisher(tcp=("127.0.0.1", 0), max_frames=2)
+        subscriber = broadcast.TcpSubscriber(publisher.address, timeout=5)
+        while not publisher.clients:
+            time.sleep(0.01)
+
+        client = publisher.clients[0]
+        with client.cond:
+            # The sender thread is blocked, so the buffer is overflowed
+            for seq in range(3):
+                publisher.publish(seq, [], [0] * 150)
+        self.assertEqual([], publisher.clients)
+        self.assertEqual(1, publisher.dropped)
+        subscriber.close()
+        publisher.close()
+
+    def test_stalled_client(self):
+        publisher = broadcast.FramePublisher(tcp=("127.0.0.1", 0), max_frames=64)
+        viewer = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        viewer.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        viewer.connect(publisher.address)
+        while not publisher.clients:
+            time.sleep(0.01)
+
+        # The viewer does not read, so the sender is blocked in sendall
+        client = publisher.clients[0]
+        seq = 0
+        while not publisher.dropped and seq < 100000:
+            seq += 1
+            publisher.publish(seq, [], [0] * 150)
+            time.sleep(0.0001)
+        self.assertEqual(1, publisher.dropped)
+        for _ in range(100):
+            if client.sock.fileno() == -1:
+                break
+            time.sleep(0.01)
+        self.assertEqual(-1, client.sock.fileno())
+        viewer.close()
+        publisher.close()
+
+    def test_restart(self):
+        publisher = broadcast.FramePublisher(tcp=("127.0.0.1", 0))
+        address = publisher.address
+        subscriber = broadcast.TcpSubscriber(address, timeout=5)
+        while not publisher.clients:
+            time.sleep(0.01)
+        publisher.close()
+        subscriber.close()
+
+        publisher = broadcast.FramePublisher(tcp=address)
+        self.assertEqual(address, publisher.address)
+        publisher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+import codec
+import proxy
+
+
+class TestCodec(unittest.TestCase):
+    def test_kf1(self):
+        values = [300, -5, 0, 999, -999, 1]
+        cm = codec.Codec(dict(codec.PROTOCOLS['CM2'], count_byte=False))
+        self.assertEqual(b"$CM\x01\x01,\x02\xff\xfb\x03\x00\x00\x04\x03\xe7\x05\xfc\x19\x06\x00\x01\xf0\r\n",
+                         cm.encode(values))
+        self.assertEqual(b"$CM\x02\xff\xfb\x05\xfc\x19\xca\r\n", cm.encode(values, channels=[2, 5]))
+
+        amk = codec.Codec(codec.PROTOCOLS['CM2'])
+        self.assertEqual(b"$CM\x06\x01\x01,", amk.encode(values)[:7])
+        self.assertEqual(b"$CM\x02\x02\xff\xfb\x05\xfc\x19\xcc\r\n", amk.encode(values, channels=[2, 5]))
+        self.assertEqual(b"$CM\x01\x02\x00\x14", amk.encode([10, 20, 30], channels=[2])[:7])
+
+        message = b"$01\x01\x01,\x02\xff\xfb\x03\x00\x00\x04\x03\xe7\x05\xfc\x19\x06\x00\x01\xc1\r\n"
+        self.assertTrue(proxy.INPUT.check(message))
+        self.assertEqual(values, proxy.INPUT.decode(message))
+        self.assertEqual(message, proxy.INPUT.encode(values))
+
+    def test_imax_byte(self):
+        encoder = codec.Codec(dict(codec.PROTOCOLS['CM2'], imax_byte=True), imax=55)
+        message = encoder.encode([1, 2])
+        self.assertEqual(b"$CM\x02\x37\x01\x00\x01\x02\x00\x02", message[:-3])
+        self.assertTrue(encoder.check(message))
+        self.assertEqual([1, 2], encoder.decode(message))
+
+    def test_layout(self):
+        layout = {"header": "#K", "index_byte": False, "value_bytes": 4, "signed": False,
+                  "byteorder": "little", "checksum": "xor8", "end": "\n"}
+        encoder = codec.Codec(layout)
+        message = encoder.encode([1, 70000])
+        self.assertEqual(b"#K\x01\x00\x00\x00\x70\x11\x01\x00", message[:-2])
+        self.assertEqual(0x23 ^ 0x4B ^ 0x01 ^ 0x70 ^ 0x11 ^ 0x01, message[-2])
+        self.assertTrue(encoder.check(message))
+        self.assertEqual([1, 70000], encoder.decode(message))
+        with self.assertRaises(ValueError):
+            encoder.encode([1, 2], channels=[1])
+
+    def test_check(self):
+        message = proxy.INPUT.encode([1, 2, 3])
+        self.assertFalse(proxy.INPUT.check(message[:5] + b"\x09" + message[6:]))
+        self.assertFalse(proxy.INPUT.check(message[:-4] + message[-3:]))
+        self.assertFalse(proxy.INPUT.check(b"$01\r\n"))
+        self.assertFalse(proxy.INPUT.check(message[1:]))
+        self.assertTrue(codec.Codec({"header": "$", "checksum": "none"}).check(b"$\x01\x00\x05\r\n"))
+
+    def test_size(self):
+        message = proxy.INPUT.encode([1, 2, 3])
+        self.assertEqual(len(message), proxy.INPUT.size(message[:proxy.INPUT.prefix_size], 3))
+        encoder = codec.Codec(codec.PROTOCOLS['CM2'])
+        message = encoder.encode([1, 2, 3, 4])
+        self.assertEqual(len(message), encoder.size(message[:encoder.prefix_size]))
+
+    def test_wrong_layout(self):
+        for layout in ({"value_bytes": 3}, {"checksum": "crc"}, {"header": "$", "crc": 1}):
+            with self.assertRaises(ValueError):
+                codec.Codec(layout)
+
+    def test_output_layout(self):
+        settings = {"header": "CM2", "channels_byte": False, "imax_byte": True}
+        layout = codec.output_layout(settings)
+        self.assertEqual((False, True), (layout['count_byte'], layout['imax_byte']))
+        with self.assertRaises(ValueError):
+            codec.output_layout({"header": "XX"})
+
+
+if __name__ == "__main__":
+    unittest.main()
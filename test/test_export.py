@@ -0,0 +1,110 @@
+import csv
+import os
+import struct
+import tempfile
+import unittest
+
+import export
+import proxy
+import recorder
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "capture.rec")
+        self.prefix = os.path.join(self.tmp.name, "out")
+        rec = recorder.Recorder(self.path, 3, 2)
+        for i in range(10):
+            rec.write(i, [i, -i, 100], [2 * i], timestamp=1000.0 + i)
+        rec.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_capture(self):
+        with recorder.Capture(self.path) as capture:
+            self.assertEqual(10, len(capture))
+            self.assertEqual((3, 2), (capture.inputs, capture.outputs))
+            self.assertEqual((3, 7), capture.select(1003, 1006.5))
+            data = b"".join(chunk.data for chunk in capture.chunks(chunk=3))
+            records = capture.decode(data)
+        self.assertEqual((1004.0, 4, (4, -4, 100), (8, 0)), records[4])
+
+    def test_incomplete_record(self):
+        with open(self.path, 'ab') as f:
+            f.write(b"\0" * 5)
+        with recorder.Capture(self.path) as capture:
+            self.assertEqual(10, len(capture))
+
+    def test_npy(self):
+        paths, stats = export.export(self.path, self.prefix, "npy", start=1001, every=3, chunk=4)
+        self.assertEqual(4, len(paths))
+        self.assertIsNone(stats)
+
+        descr, shape, data = export.read_npy(self.prefix + "_inputs.npy")
+        self.assertEqual(('<i2', (3, 3)), (descr, shape))
+        self.assertEqual([1, -1, 100, 4, -4, 100, 7, -7, 100], list(struct.unpack("<9h", data)))
+
+        descr, shape, data = export.read_npy(self.prefix + "_time.npy")
+        self.assertEqual(('<f8', (3,)), (descr, shape))
+        self.assertEqual((1001.0, 1004.0, 1007.0), struct.unpack("<3d", data))
+
+        with open(self.prefix + "_seq.npy", 'rb') as f:
+            self.assertEqual(0, f.read().index(struct.pack("<I", 1)) % 64)
+
+    def test_csv_and_stats(self):
+        paths, stats = export.export(self.path, self.prefix, "csv", stop=1005, every=2, stats=True)
+        with open(paths[0], newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(["time", "seq", "in1", "in2", "in3", "out1", "out2"], rows[0])
+        self.assertEqual(["1002.0", "2", "2", "-2", "100", "4", "0"], rows[2])
+        self.assertEqual(4, len(rows))
+
+        # Statistics does not depend on decimation
+        self.assertEqual(5, stats["input"]["count"])
+        self.assertEqual([0, -4, 100], stats["input"]["min"])
+        self.assertEqual(4.0, stats["output"]["mean"][0])
+
+    def test_parquet(self):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            self.skipTest("pyarrow is not installed")
+        paths, _ = export.export(self.path, self.prefix, "parquet", chunk=4)
+        table = pyarrow.parquet.read_table(paths[0])
+        self.assertEqual(10, table.num_rows)
+        self.assertEqual(list(range(10)), table.column("seq").to_pylist())
+
+    def test_not_overwritten(self):
+        first = recorder.Recorder.create(self.tmp.name, 1, 1)
+        second = recorder.Recorder.create(self.tmp.name, 1, 1)
+        first.close()
+        second.close()
+        self.assertNotEqual(first.path, second.path)
+        with self.assertRaises(FileExistsError):
+            recorder.Recorder(self.path, 3, 2)
+        with recorder.Capture(self.path) as capture:
+            self.assertEqual(10, len(capture))
+
+    def test_relay(self):
+        # The virtual ADC sends 6 inputs to the compensator of 3 channels
+        relay = proxy.Relay({
+            "port_input": "VCOM", "port_output": "VCOM", "imax": 10, "channels": 3,
+            "channels_byte": True, "interval": 1000, "record": self.tmp.name
+        })
+        relay.set_pattern(['L', 'Null', 'Max'])
+        relay.step()
+        relay.step()
+        relay.close()
+
+        with recorder.Capture(relay.recorder.path) as capture:
+            self.assertEqual((6, 3), (capture.inputs, capture.outputs))
+            records = capture.decode(next(capture.chunks()).data)
+        self.assertEqual([(1, (300, 0, 0, 0, 0, 0), (1000, 0, 999)),
+                          (2, (300, 0, 0, 0, 0, 0), (1000, 0, 999))],
+                         [record[1:] for record in records])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+import handlers
+import proxy
+
+
+class Gain(handlers.Handler):
+    def __init__(self, gain=1):
+        self.gain = gain
+
+    def process(self, buffer, count):
+        for i in range(count):
+            buffer[i] = buffer[i] * self.gain
+        return count
+
+
+class Pick(handlers.Handler):
+    inputs = 4
+    outputs = 2
+
+    def process(self, buffer, count):
+        buffer[0], buffer[1] = buffer[3], buffer[2]
+        return 2
+
+
+class TestHandlerChain(unittest.TestCase):
+    def setUp(self):
+        self.settings = {"imax": 9.99, "channels": 6}
+        self.data = [-300, -100, -50, 0, 100, 300]
+
+    def test_default_chain(self):
+        chain = handlers.build_chain(None, self.settings)
+        values = proxy.message_pattern(['Max', 'Null', 'L', 'Min', 'L', 'Null'], imax=9.98)
+        chain.set_pattern(proxy.PatternHandler(values, 6))
+
+        old = proxy.VoltageHandler(imax=9.99)(self.data)
+        old = proxy.PatternHandler(values, 6)(old)
+        self.assertEqual(old, chain(self.data))
+
+    def test_voltage(self):
+        chain = handlers.build_chain([{"name": "voltage", "imax": 54.59}], self.settings)
+        self.assertEqual(proxy.VoltageHandler(imax=54.59)(self.data), chain(self.data))
+
+    def test_buffer_is_reused(self):
+        chain = handlers.build_chain(None, self.settings)
+        buffer = chain.buffer
+        chain(self.data)
+        chain(self.data[:3])
+        self.assertIs(buffer, chain.buffer)
+
+    def test_pattern_slot(self):
+        handlers.register('gain', Gain)
+        chain = handlers.build_chain([{"name": "pattern"}, {"name": "gain", "gain": 2}], self.settings)
+        chain.set_pattern(proxy.PatternHandler([1, 'L', 3], 3))
+        self.assertEqual([2, -600, 6], chain(self.data))
+
+    def test_channels(self):
+        handlers.register('pick', Pick)
+        chain = handlers.build_chain([{"name": "pick"}], self.settings)
+        self.assertEqual([0, -50], chain(self.data))
+        with self.assertRaises(ValueError):
+            chain(self.data[:3])
+        with self.assertRaises(ValueError):
+            handlers.HandlerChain([Pick(), Pick()])
+
+    def test_list_api(self):
+        self.assertEqual([0, -50], Pick()(self.data))
+        self.assertEqual([-600, -200], Gain(2)(self.data[:2]))
+
+    def test_list_api_padding(self):
+        class Spread(handlers.Handler):
+            outputs = 5
+
+            def process(self, buffer, count):
+                self.size = len(buffer)
+                buffer[1:5] = buffer[0:4]
+                return 5
+
+        spread = Spread()
+        self.assertEqual([7, 7, 8, 0, 0], spread([7, 8]))
+        self.assertEqual(5, spread.size)
+
+    def test_default_chain_without_proxy(self):
+        # Built-in stages must be registered by the handlers module itself
+        code = "import sys, handlers; handlers.build_chain(None, {'imax': 10}); print('proxy' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual("False", result.stdout.strip(), result.stderr)
+
+
+class TestRegistry(unittest.TestCase):
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            handlers.get('no such handler')
+
+    def test_entry_points(self):
+        ep = mock.Mock()
+        ep.name = 'plugin_gain'
+        ep.load.return_value = Gain
+        with mock.patch.object(handlers, '_entry_points', return_value=[ep]), \
+                mock.patch.object(handlers, '_discovered', False):
+            self.assertIs(Gain, handlers.get('plugin_gain'))
+            self.assertIn('plugin_gain', handlers.available())
+
+
+if __name__ == "__main__":
+    unittest.main()
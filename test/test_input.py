@@ -0,0 +1,92 @@
+import io
+import threading
+import time
+import unittest
+from unittest import mock
+
+import codec
+import proxy
+
+
+def adc_message(values):
+    return proxy.INPUT.encode(values)
+
+
+class QueuePort:
+    """ ADC port which returns prepared messages and then blocks """
+
+    def __init__(self, messages, period=0.005):
+        self.messages = list(messages)
+        self.period = period
+        self.closed = threading.Event()
+
+    def read(self):
+        if self.messages:
+            time.sleep(self.period)
+            return self.messages.pop(0)
+        self.closed.wait()
+        raise proxy.PortUnavailable("closed")
+
+    def close(self):
+        self.closed.set()
+
+
+class TestMessage(unittest.TestCase):
+    def test_median(self):
+        self.assertEqual([2, 20], proxy.median([[1, 10], [2, 20], [3, 30]]))
+        self.assertEqual([15], proxy.median([[10], [20]]))
+
+
+class TestPortInput(unittest.TestCase):
+    def open(self, data, **kwargs):
+        with mock.patch.object(proxy.serial, 'Serial', return_value=io.BytesIO(data)):
+            return proxy.PortInput("COM1", **kwargs)
+
+    def test_sync(self):
+        message = adc_message([300, 0, -5, 36, 0, 0])
+        port = self.open(b"\x24\x30" + message[5:] + message + message)
+        self.assertEqual(message, port.read())
+        self.assertEqual(message, port.read())
+
+    def test_layout(self):
+        decoder = codec.Codec({"header": "#A", "count_byte": True})
+        messages = [decoder.encode([1, 2]), decoder.encode([1, 2, 3, 4, 5, 6, 7, 8])]
+        port = self.open(b"".join(messages), decoder=decoder)
+        self.assertEqual(messages, [port.read(), port.read()])
+
+        decoder = codec.Codec({"header": "#A", "checksum": "none"})
+        message = decoder.encode([1, 2, 3])
+        port = self.open(b"\x00" + message, decoder=decoder, channels=3)
+        self.assertEqual(message, port.read())
+
+
+class TestMultiInput(unittest.TestCase):
+    def test_failover(self):
+        good = adc_message([100, 0, 0, 0, 0, 0])
+        bad = good[:-3] + b"\x00" + good[-2:]
+        main = QueuePort([good, bad, bad], period=0.001)
+        backup = QueuePort([adc_message([200, 0, 0, 0, 0, 0])] * 3, period=0.05)
+        reader = proxy.MultiInput([main, backup], max_age=1.0)
+
+        self.assertEqual(100, proxy.INPUT.decode(reader.read())[0])
+        self.assertEqual(200, proxy.INPUT.decode(reader.read())[0])
+        self.assertEqual(2, reader.sources[0].invalid)
+        self.assertEqual(1, reader.sources[1].used)
+        reader.close()
+
+    def test_median(self):
+        ports = [QueuePort([adc_message([v, 0, 0, 0, 0, 0])]) for v in (100, 110, 500)]
+        reader = proxy.MultiInput(ports, mode='median', max_age=1.0)
+        time.sleep(0.1)
+        self.assertEqual(110, proxy.INPUT.decode(reader.read())[0])
+        reader.close()
+
+    def test_no_input(self):
+        reader = proxy.MultiInput([QueuePort([]), QueuePort([])], max_age=0.05)
+        with self.assertRaises(proxy.PortUnavailable):
+            reader.read()
+        reader.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import threading
+import time
+import unittest
+
+import serial
+
+import proxy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestOutputStage(unittest.TestCase):
+    def test_slew_rate(self):
+        stage = proxy.OutputStage(slew=100)
+        self.assertEqual([100, -100, 50], stage.limit([999, -999, 50]))
+        self.assertEqual([200, -200, 50], stage.limit([999, -999, 50]))
+        self.assertEqual([150, -150, 50], stage.limit([150, -150, 50]))
+
+    def test_without_slew_rate(self):
+        stage = proxy.OutputStage()
+        self.assertEqual([999, -999], stage.limit([999, -999]))
+
+    def test_send_every_cycle(self):
+        stage = proxy.OutputStage()
+        self.assertIsNone(stage.select([1, 2]))
+        self.assertIsNone(stage.select([1, 2]))
+
+    def test_keepalive(self):
+        clock = FakeClock()
+        stage = proxy.OutputStage(keepalive=1, clock=clock)
+        self.assertIsNone(stage.select([1, 2]))
+        clock.now = 0.5
+        self.assertEqual([], stage.select([1, 2]))
+        self.assertIsNone(stage.select([1, 3]))
+        clock.now = 1.6
+        self.assertIsNone(stage.select([1, 3]))
+        self.assertEqual(1, stage.skipped)
+
+    def test_delta(self):
+        clock = FakeClock()
+        stage = proxy.OutputStage(keepalive=1, delta=True, clock=clock)
+        self.assertIsNone(stage.select([1, 2, 3]))
+        self.assertEqual([2], stage.select([1, 5, 3]))
+        self.assertEqual([], stage.select([1, 5, 3]))
+        clock.now = 1
+        self.assertIsNone(stage.select([1, 5, 3]))
+
+
+class SlowPort:
+    def __init__(self):
+        self.frames = []
+        self.gate = threading.Event()
+        self.closed = False
+
+    @property
+    def out_waiting(self):
+        return 0 if self.gate.is_set() else 1
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+    def close(self):
+        self.closed = True
+
+
+class TestFrameWriter(unittest.TestCase):
+    def test_latest_wins(self):
+        port = SlowPort()
+        writer = proxy.FrameWriter(port)
+        writer.start()
+        self.assertTrue(writer.write(b"1"))
+        self.assertFalse(writer.write(b"2"))
+        self.assertFalse(writer.write(b"3"))
+        port.gate.set()
+        writer.close()
+        self.assertEqual([b"3"], port.frames)
+        self.assertEqual(2, writer.superseded)
+        self.assertTrue(port.closed)
+
+    def test_stalled_port(self):
+        port = StalledPort()
+        writer = proxy.FrameWriter(port)
+        writer.start()
+        writer.write(b"1")
+        port.blocked.wait(1)
+        start = time.monotonic()
+        with self.assertLogs(proxy.logger, 'WARNING'):
+            writer.close(timeout=0.1)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertTrue(port.closed)
+        writer.join(1)
+        self.assertFalse(writer.is_alive())
+        self.assertEqual(1, writer.lost)
+
+
+class StalledPort(SlowPort):
+    """ The write is blocked until the port is closed """
+
+    def __init__(self):
+        super().__init__()
+        self.gate.set()
+        self.blocked = threading.Event()
+        self.released = threading.Event()
+
+    def write(self, frame):
+        self.blocked.set()
+        self.released.wait()
+        raise serial.SerialException("Port is closed")
+
+    def close(self):
+        self.closed = True
+        self.released.set()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import profiling
+
+
+class TestStageTimers(unittest.TestCase):
+    def test_disabled(self):
+        timers = profiling.StageTimers()
+        timers.mark('read', profiling.clock())
+        self.assertEqual({}, timers.stages)
+
+    def test_mark(self):
+        timers = profiling.StageTimers(enabled=True)
+        start = profiling.clock()
+        start = timers.mark('read', start - 1000)
+        timers.mark('read', start - 3000)
+        count, total, low, high = timers.stages['read']
+        self.assertEqual(2, count)
+        self.assertGreaterEqual(low, 1000)
+        self.assertGreaterEqual(high, 3000)
+        self.assertIn('read', timers.report())
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_capture(self):
+        path = os.path.join(tempfile.mkdtemp(), "profile.txt")
+        profiler = profiling.SamplingProfiler(0.1, interval=0.001, path=path)
+        profiler.start()
+        while profiler.is_alive():
+            time.sleep(0.001)
+        self.assertGreater(profiler.samples, 0)
+        with open(path) as f:
+            self.assertIn("test_capture", f.read())
+
+
+class TestReportPath(unittest.TestCase):
+    def test_frozen(self):
+        directory = tempfile.mkdtemp()
+        with mock.patch.object(profiling, 'REPORTS', ''), \
+                mock.patch.object(profiling.sys, 'frozen', True, create=True), \
+                mock.patch.object(profiling.sys, 'executable', os.path.join(directory, "proxyui.exe")):
+            path = profiling.report_path("timers.txt")
+        self.assertEqual(os.path.join(directory, "timers.txt"), path)
+
+    def test_configured(self):
+        directory = os.path.join(tempfile.mkdtemp(), "reports")
+        with mock.patch.object(profiling, 'REPORTS', directory):
+            path = profiling.write_report()
+        self.assertTrue(os.path.isabs(path))
+        self.assertEqual(directory, os.path.dirname(path))
+        self.assertTrue(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+import serial
+
+import proxy
+import reconnect
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakyPort:
+    """ Port which fails while the adapter is unplugged """
+    plugged = True
+    opened = 0
+
+    def __init__(self, device):
+        if not FlakyPort.plugged:
+            raise serial.SerialException("could not open port")
+        FlakyPort.opened += 1
+
+    def read(self):
+        if not FlakyPort.plugged:
+            raise serial.SerialException("device reports readiness to read but returned no data")
+        return proxy.INPUT.encode([150, 0, 0, 0, 0, 0])
+
+    def close(self):
+        pass
+
+
+class TestReconnectingPort(unittest.TestCase):
+    def setUp(self):
+        FlakyPort.plugged = True
+        FlakyPort.opened = 0
+        self.clock = FakeClock()
+        self.port = reconnect.ReconnectingPort("/dev/ttyTEST", FlakyPort, backoff=1, max_backoff=4,
+                                               clock=self.clock)
+
+    def test_backoff(self):
+        self.port.read()
+        FlakyPort.plugged = False
+        with self.assertRaises(reconnect.PortUnavailable):
+            self.port.read()
+        self.assertFalse(self.port.available)
+
+        # Attempts at 0, 1, 3, 7, 11 seconds
+        for now in (0, 0.5, 1, 2, 3, 7):
+            self.clock.now = now
+            with self.assertRaises(reconnect.PortUnavailable):
+                self.port.read()
+        self.assertEqual(1, FlakyPort.opened)
+
+        FlakyPort.plugged = True
+        self.clock.now = 10
+        with self.assertRaises(reconnect.PortUnavailable):
+            self.port.read()
+        self.clock.now = 11
+        self.port.read()
+        self.assertEqual(2, FlakyPort.opened)
+        self.assertEqual(1, self.port.outages)
+        self.assertEqual(11, self.port.last_outage)
+
+    def test_relay_holds_output(self):
+        relay = proxy.Relay({
+            "port_input": "VCOM", "port_output": "VCOM", "imax": 10,
+            "channels": 6, "channels_byte": True, "keepalive": 1000, "interval": 10
+        })
+        relay.reader = self.port
+        relay.set_pattern(['L'] * 6)
+        relay.step()
+        self.assertEqual([500] * 6, relay.outputs)
+
+        FlakyPort.plugged = False
+        relay.step()
+        self.assertEqual([500] * 6, relay.outputs)
+        self.assertEqual(1, relay.held)
+
+        relay.settings['hold'] = 'null'
+        relay.step()
+        self.assertEqual([0] * 6, relay.outputs)
+        self.assertEqual(1, relay.stats()['outages'])
+        relay.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
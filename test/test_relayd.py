@@ -0,0 +1,132 @@
+import os
+import socket
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import relayd
+
+
+SETTINGS = {
+    "port_input": "VCOM",
+    "port_output": "VCOM",
+    "imax": 10,
+    "channels": 6,
+    "channels_byte": True,
+    "keepalive": 1000,
+    "interval": 10
+}
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "unix sockets are required")
+class TestRelayDaemon(unittest.TestCase):
+    def setUp(self):
+        self.address = os.path.join(tempfile.mkdtemp(), "relayd.sock")
+        self.daemon = relayd.RelayDaemon(self.address)
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+        while not os.path.exists(self.address):
+            time.sleep(0.01)
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.thread.join()
+
+    def wait_frame(self, client, outputs):
+        for _ in range(100):
+            snapshot = client.snapshot()
+            if snapshot and snapshot.outputs == outputs:
+                return snapshot
+            time.sleep(0.01)
+        self.fail("Frame is not received")
+
+    def test_attach_detach(self):
+        client = relayd.RelayClient(self.address)
+        client.subscribe()
+        client.start(['Max'] * 6, SETTINGS)
+        self.wait_frame(client, [999] * 6)
+        client.close()
+
+        # The relay works without clients
+        monitor = relayd.RelayClient(self.address)
+        monitor.subscribe()
+        status = monitor.status()
+        self.assertTrue(status['running'])
+        self.assertEqual(['Max'] * 6, status['pattern'])
+
+        monitor.set_pattern(['Min'] * 6)
+        self.wait_frame(monitor, [-999] * 6)
+
+        monitor.stop()
+        self.assertFalse(monitor.status()['running'])
+        monitor.close()
+
+    def test_error(self):
+        client = relayd.RelayClient(self.address)
+        with self.assertRaises(RuntimeError):
+            client.request('unknown')
+        client.close()
+
+    def test_permissions(self):
+        # The socket is served after chmod
+        client = relayd.RelayClient(self.address)
+        client.status()
+        client.close()
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.address).st_mode))
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "unix sockets are required")
+class TestSocketPath(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.tmp.name, "run", "relayd.sock")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_private_directory(self):
+        relayd._prepare_socket(self.address)
+        self.assertEqual(0o700, stat.S_IMODE(os.stat(os.path.dirname(self.address)).st_mode) & 0o777)
+
+    def test_shared_directory(self):
+        directory = os.path.dirname(self.address)
+        os.mkdir(directory)
+        os.chmod(directory, 0o777)
+        with self.assertRaises(PermissionError):
+            relayd._prepare_socket(self.address)
+
+        os.rmdir(directory)
+        os.symlink(self.tmp.name, directory)
+        with self.assertRaises(PermissionError):
+            relayd._prepare_socket(self.address)
+
+    def test_not_socket(self):
+        os.mkdir(os.path.dirname(self.address), 0o700)
+        with open(self.address, 'w') as f:
+            f.write("data")
+        daemon = relayd.RelayDaemon(self.address)
+        with self.assertRaises(FileExistsError):
+            daemon.serve_forever()
+        self.assertTrue(os.path.isfile(self.address))
+
+    def test_stale_socket(self):
+        os.mkdir(os.path.dirname(self.address), 0o700)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.address)
+        sock.close()
+        relayd._prepare_socket(self.address)
+        self.assertFalse(os.path.exists(self.address))
+
+    def test_default_address(self):
+        with mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": "/run/user/1000"}):
+            self.assertEqual("/run/user/1000", relayd.runtime_dir())
+        with mock.patch.dict(os.environ):
+            os.environ.pop("XDG_RUNTIME_DIR", None)
+            self.assertIn(str(os.getuid()), relayd.runtime_dir())
+
+
+if __name__ == "__main__":
+    unittest.main()
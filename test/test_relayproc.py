@@ -0,0 +1,53 @@
+import os
+import time
+import unittest
+
+from relayproc import RelayProcess
+from sharedstate import SharedState
+
+SETTINGS = {
+    "port_input": "VCOM", "port_output": "VCOM", "imax": 10,
+    "channels": 3, "channels_byte": True, "interval": 100
+}
+
+
+class TestRelayProcess(unittest.TestCase):
+    def setUp(self):
+        self.relay = RelayProcess(name="degaus-test-{}".format(os.getpid()))
+        self.relay.start(['Max', 'L', 'Null'], SETTINGS)
+
+    def tearDown(self):
+        self.relay.stop()
+
+    def test_late_reply(self):
+        # The reply to the abandoned request must not answer the next one
+        self.assertEqual({}, self.relay.statistics(timeout=0))
+        self.assertIsNone(self.relay.profile(enabled=True, timeout=5))
+        self.assertIn('output', self.relay.statistics(timeout=5))
+        self.assertFalse(self.relay._received)
+
+    def test_poll_statistics(self):
+        self.assertEqual({}, self.relay.poll_statistics())
+        deadline = time.monotonic() + 5
+        while not self.relay.poll_statistics() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertIn('output', self.relay.poll_statistics())
+
+
+class TestFailure(unittest.TestCase):
+    def test_relay_is_not_started(self):
+        relay = RelayProcess()
+        settings = dict(SETTINGS)
+        del settings['imax']
+        relay.start(['Max', 'L', 'Null'], settings)
+        relay.process.join(10)
+        self.assertFalse(relay.is_alive())
+        self.assertNotEqual(0, relay.process.exitcode)
+        # The block is removed
+        with self.assertRaises(FileNotFoundError):
+            SharedState(relay.name)
+        relay.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
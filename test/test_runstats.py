@@ -0,0 +1,52 @@
+import os
+import statistics
+import tempfile
+import unittest
+
+import runstats
+
+
+class TestRunningStats(unittest.TestCase):
+    def setUp(self):
+        self.frames = [[1, -10], [4, -20], [7, -60], [2, -10]]
+
+    def test_welford(self):
+        stats = runstats.RunningStats()
+        for frame in self.frames:
+            stats.update(frame)
+        result = stats.result()
+        self.assertEqual(4, result['count'])
+        self.assertEqual([1, -60], result['min'])
+        self.assertEqual([7, -10], result['max'])
+        for i, column in enumerate(zip(*self.frames)):
+            self.assertAlmostEqual(statistics.mean(column), result['mean'][i])
+            self.assertAlmostEqual(statistics.stdev(column), result['std'][i])
+
+    def test_window(self):
+        stats = runstats.RunningStats(window=3)
+        for frame in self.frames:
+            stats.update(frame)
+        self.assertEqual(3, stats.previous['count'])
+        self.assertEqual([4.0, -30.0], stats.previous['mean'])
+        self.assertEqual(1, stats.count)
+
+    def test_decaying(self):
+        stats = runstats.DecayingStats(alpha=0.5)
+        stats.update([0])
+        stats.update([10])
+        self.assertEqual([5.0], stats.result()['mean'])
+        self.assertEqual([5.0], stats.result()['std'])
+
+    def test_write_csv(self):
+        stats = runstats.RunningStats()
+        stats.update([1, 2])
+        path = os.path.join(tempfile.mkdtemp(), "stats.csv")
+        runstats.write_csv(path, {"output": stats.result()})
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual("name,channel,count,min,max,mean,std", lines[0])
+        self.assertEqual("output,2,1,2,2,2.0,0.0", lines[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import unittest
+
+import proxy
+import sequencer
+
+
+SCRIPT = {
+    "name": "Calibration",
+    "steps": [
+        {"pattern": "Max", "channels": "1-2", "duration": 2000},
+        {"pattern": ["Min", "L"], "frames": 1},
+        {"pattern": "Null", "duration": 1000}
+    ]
+}
+
+
+class TestSequencer(unittest.TestCase):
+    def test_parse_channels(self):
+        self.assertEqual({0, 1, 2, 5}, sequencer.parse_channels("1-3, 6", 6))
+        self.assertEqual({0, 1, 2}, sequencer.parse_channels(None, 3))
+        with self.assertRaises(ValueError):
+            sequencer.parse_channels("5-7", 6)
+
+    def test_compile(self):
+        seq = sequencer.Sequencer(SCRIPT, channels=3, imax=10, interval=1000)
+        states, handler, frames = seq.steps[0]
+        self.assertEqual(['Max', 'Max', 'Null'], states)
+        self.assertEqual(2, frames)
+        self.assertEqual(['Min', 'L', 'Null'], seq.steps[1][0])
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "script.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(SCRIPT, f)
+            seq = sequencer.Sequencer.load(path, {"channels": 3, "imax": 10, "interval": 1000})
+        self.assertEqual(SCRIPT, seq.script)
+        self.assertEqual("Calibration", seq.name)
+        self.assertEqual(2, seq.steps[0][2])
+
+    def test_unknown_state(self):
+        with self.assertRaises(ValueError):
+            sequencer.Sequencer({"steps": [{"pattern": "Top", "frames": 1}]}, 3, 10, 1000)
+
+    def test_relay(self):
+        relay = proxy.Relay({
+            "port_input": "VCOM", "port_output": "VCOM", "imax": 10,
+            "channels": 3, "channels_byte": True, "interval": 1000
+        })
+        relay.set_pattern(['Null'] * 3)
+        relay.set_sequence(sequencer.Sequencer(SCRIPT, channels=3, imax=10, interval=1000))
+
+        outputs = []
+        for _ in range(5):
+            relay.step()
+            outputs.append(relay.outputs)
+        relay.close()
+
+        self.assertEqual([[999, 999, 0], [999, 999, 0], [-999, 1000, 0], [0, 0, 0], [0, 0, 0]], outputs)
+        self.assertTrue(relay.sequencer.finished)
+        self.assertEqual(3, relay.stats()['step'])
+
+    def test_relay_restores_pattern(self):
+        relay = proxy.Relay({
+            "port_input": "VCOM", "port_output": "VCOM", "imax": 10,
+            "channels": 3, "channels_byte": True, "interval": 1000
+        })
+        relay.set_pattern(['Max', 'Min', 'Null'])
+        relay.set_sequence(sequencer.Sequencer(SCRIPT, channels=3, imax=10, interval=1000))
+
+        outputs = []
+        for _ in range(6):
+            # The GUI sets the same pattern every cycle
+            relay.set_pattern(['Max', 'Min', 'Null'])
+            relay.step()
+            outputs.append(relay.outputs)
+
+        relay.set_sequence(sequencer.Sequencer(SCRIPT, channels=3, imax=10, interval=1000))
+        relay.step()
+        relay.set_sequence(None)
+        relay.step()
+        cancelled = relay.outputs
+        relay.close()
+
+        self.assertEqual([0, 0, 0], outputs[3])
+        self.assertEqual([[999, -999, 0], [999, -999, 0]], outputs[4:])
+        self.assertEqual([999, -999, 0], cancelled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+import sharedstate
+
+
+class TestSharedState(unittest.TestCase):
+    def setUp(self):
+        self.name = "degaus-monitor-test"
+        self.writer = sharedstate.SharedState(name=self.name, create=True)
+        self.reader = sharedstate.SharedState(name=self.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+
+    def test_empty(self):
+        self.assertIsNone(self.reader.read())
+
+    def test_publish(self):
+        self.writer.publish([300, 0, -5], [999, -999], {"frames": 1, "written": 1})
+        self.writer.publish([200, 0, -5], [500, -999], {"frames": 2, "written": 1}, alarms=[2])
+        snapshot = self.reader.read()
+        self.assertEqual(2, snapshot.seq)
+        self.assertEqual([200, 0, -5], snapshot.inputs)
+        self.assertEqual([500, -999], snapshot.outputs)
+        self.assertEqual(2, snapshot.stats["frames"])
+        self.assertEqual(0, snapshot.stats["superseded"])
+        self.assertEqual([2], snapshot.alarms)
+
+    def test_name_in_use(self):
+        self.writer.publish([1], [2], {"frames": 1})
+        with self.assertRaises(FileExistsError):
+            sharedstate.SharedState(name=self.name, create=True)
+        self.assertEqual([2], self.reader.read().outputs)
+
+    def test_unique_name(self):
+        self.assertNotEqual(sharedstate.unique_name(), sharedstate.unique_name())
+        self.assertLess(len(sharedstate.unique_name()), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
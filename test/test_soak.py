@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+
+import soak
+
+
+def samples(field, values):
+    result = []
+    for i, value in enumerate(values):
+        sample = dict(time=i * 10.0, frames=i, rate=0, rss=1000, fds=5, objects=100, gc0=0, gc1=0,
+                      gc2=0, p50=10, p99=20, max=30)
+        sample[field] = value
+        result.append(soak.Sample(**sample))
+    return result
+
+
+class TestCheck(unittest.TestCase):
+    def test_flat(self):
+        self.assertEqual([], soak.check(samples("rss", [1000, 1010, 995, 1005, 1000, 1002])))
+
+    def test_growth(self):
+        failures = soak.check(samples("rss", [1000, 1100, 1200, 1300, 1400, 1500]))
+        self.assertEqual(1, len(failures))
+        self.assertTrue(failures[0].startswith("rss"))
+        self.assertEqual(1, len(soak.check(samples("fds", [5, 5, 6, 6, 7, 7]))))
+
+    def test_warmup(self):
+        values = [100, 1000, 1000, 1000, 1000, 1000, 1000, 1000, 1000, 1000]
+        self.assertEqual(1, len(soak.check(samples("objects", values), warmup=0)))
+        self.assertEqual([], soak.check(samples("objects", values), warmup=0.1))
+
+    def test_histogram(self):
+        histogram = soak.Histogram()
+        for us in range(1, 101):
+            histogram.add(us / 1e6)
+        self.assertAlmostEqual(50, histogram.percentile(50), delta=5)
+        self.assertAlmostEqual(100, histogram.percentile(99), delta=10)
+        self.assertEqual(100, round(histogram.max))
+
+
+class TestSoak(unittest.TestCase):
+    def test_memory(self):
+        result = soak.run_memory(0.3, 0.1, channels=43)
+        self.assertGreaterEqual(len(result), 3)
+        self.assertGreater(result[-1].frames, result[0].frames)
+
+    @unittest.skipUnless(sys.platform.startswith('linux') and hasattr(os, 'openpty'), "requires pty")
+    def test_pty(self):
+        fds = soak.open_fds()
+        result = soak.run_pty(0.3, 0.1, channels=6)
+        self.assertGreater(result[-1].frames, 0)
+        self.assertEqual(len({s.fds for s in result}), 1)
+        self.assertEqual(fds, soak.open_fds())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,16 @@
+import importlib.util
+import statistics
+import unittest
+
+import bench_startup
+
+
+@unittest.skipUnless(importlib.util.find_spec('PyQt5'), "PyQt5 is required")
+class TestStartup(unittest.TestCase):
+    def test_startup_time(self):
+        window = [window_ms for window_ms, _ in bench_startup.measure(runs=3)]
+        self.assertLess(statistics.median(window), bench_startup.BUDGET_MS)
+
+
+if __name__ == "__main__":
+    unittest.main()
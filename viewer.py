@@ -0,0 +1,83 @@
+""" Remote viewer of the channel panel.
+
+    Shows frames broadcasted by the relay (see broadcast) on the same
+    panel as the one at the cabinet.
+
+    Usage: python viewer.py (--udp GROUP:PORT | --tcp HOST:PORT)
+"""
+
+import argparse
+from collections import deque
+import sys
+import threading
+
+from PyQt5.QtWidgets import QApplication, QGroupBox, QMainWindow, QVBoxLayout, QWidget
+
+import broadcast
+from panel import PanelView, RadioBox
+
+
+class Viewer(QMainWindow):
+    def __init__(self, subscriber, interval=200):
+        super().__init__()
+        self.subscriber = subscriber
+        self.frames = deque(maxlen=1)
+
+        self.setWindowTitle("Мониторинг КЭД КФ1/1М (просмотр)")
+
+        self.radiobox = RadioBox(title="Группа обмоток: ", group_names=('I', 'II', 'III'))
+        self.pview = PanelView(data=[])
+
+        gbox = QGroupBox('Амперметры')
+        layout = QVBoxLayout(gbox)
+        layout.addWidget(self.radiobox)
+        layout.addWidget(self.pview)
+
+        central = QWidget(self)
+        QVBoxLayout(central).addWidget(gbox)
+        self.setCentralWidget(central)
+
+        self.radiobox.buttonClicked.connect(self._on_switch_group)
+
+        threading.Thread(target=self._receive, daemon=True).start()
+        self.startTimer(interval)
+
+    def _on_switch_group(self, rbutton):
+        self.pview.set_page(('I', 'II', 'III').index(rbutton.text()))
+
+    def _receive(self):
+        try:
+            while True:
+                self.frames.append(self.subscriber.receive())
+        except (OSError, ConnectionError):
+            pass
+
+    def timerEvent(self, event):
+        if not self.frames:
+            return
+        frame = self.frames.popleft()
+        self.pview.set_data(frame.outputs)
+        self.statusBar().showMessage("Кадр {}, Voltage: {}".format(
+            frame.seq, ",".join(str(i) for i in frame.inputs)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remote viewer of the relay frames")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--udp', help="GROUP:PORT")
+    group.add_argument('--tcp', help="HOST:PORT")
+    args = parser.parse_args(argv)
+
+    if args.udp:
+        subscriber = broadcast.UdpSubscriber(broadcast.parse_address(args.udp))
+    else:
+        subscriber = broadcast.TcpSubscriber(broadcast.parse_address(args.tcp))
+
+    app = QApplication(sys.argv[:1])
+    viewer = Viewer(subscriber)
+    viewer.show()
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    sys.exit(main())